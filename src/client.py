@@ -29,16 +29,31 @@ LEARNING OBJECTIVES:
 """
 
 import os
+import re
+import uuid
 from typing import Optional, Dict, Any, List
 
 # OpenAI's official Python library - handles HTTPS, auth, retries
-from openai import OpenAI, AuthenticationError, RateLimitError, APIError
+import httpx
+import orjson
+from openai import (
+    OpenAI, AsyncOpenAI, DefaultHttpxClient, DefaultAsyncHttpxClient,
+    AuthenticationError, RateLimitError, APIError, APIConnectionError, APITimeoutError,
+    InternalServerError
+)
+
+# Retry helpers: exponential backoff with jitter
+from tenacity import (
+    Retrying, AsyncRetrying, RetryCallState,
+    retry_if_exception, stop_after_attempt, wait_exponential_jitter
+)
 
 # Load environment variables from .env file (keeps secrets out of code)
 from dotenv import load_dotenv
 
 # Our data models from Chapter 1
 from src.models import ImageOptions, ImageError, StoryOptions, StoryScene
+from src.rate_limiter import TokenBucket
 
 
 # ============================================================================
@@ -60,6 +75,110 @@ from src.models import ImageOptions, ImageError, StoryOptions, StoryScene
 load_dotenv()
 
 
+# ============================================================================
+# RETRY POLICY: When (and how long) to try again
+# ============================================================================
+# 📝 CONCEPT: Transient vs Permanent Errors
+# -----------------------------------------
+# Some failures fix themselves if you wait: rate limits (429), dropped
+# connections, timeouts. Others never will: a bad API key or a prompt that
+# breaks the content policy. We only retry the first kind.
+#
+# 💡 Exponential backoff with jitter: wait 0.5s, ~1s, ~2s, ~4s... plus a
+# little randomness so many clients don't all retry at the same instant.
+# If OpenAI tells us exactly how long to wait (Retry-After), we listen.
+#
+# ⚠️ Generating an image costs money. If a request times out AFTER the
+# server started working on it, a blind retry could bill us twice. Every
+# call therefore sends an Idempotency-Key header that stays the same across
+# its retries, so the server can recognize a repeat and answer it once.
+# That is also what makes it safe to retry 5xx server errors.
+
+RETRYABLE_ERRORS = (RateLimitError, APIConnectionError, APITimeoutError, InternalServerError)
+
+# No single wait is longer than this - not even one the server asks for
+MAX_RETRY_WAIT = 30
+
+_backoff = wait_exponential_jitter(multiplier=0.5, max=MAX_RETRY_WAIT)
+
+
+# ============================================================================
+# CONNECTION POOL: One multiplexed connection instead of many
+# ============================================================================
+# 📝 CONCEPT: HTTP/2
+# ------------------
+# With HTTP/1.1 each in-flight request needs its own TCP + TLS connection.
+# HTTP/2 carries many requests ("streams") over ONE connection at once, so
+# concurrent generations skip the extra handshakes entirely.
+
+HTTP_LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=20)
+
+# OpenAI secret keys: "sk-" (or "sk-proj-") followed by a long run of
+# letters, digits, "_" and "-". Stray spaces or newlines from copy-paste
+# don't match, so they're caught before they cause a 401.
+_API_KEY_RE = re.compile(r'sk-(?:proj-)?[A-Za-z0-9_\-]{32,}')
+
+
+# Rate-limit reset durations look like "1s", "6m0s" or "20ms"
+_DURATION_RE = re.compile(r'(\d+(?:\.\d+)?)(ms|h|m|s)')
+_DURATION_UNITS = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+
+
+def _parse_duration(value: Optional[str]) -> Optional[float]:
+    """Convert an OpenAI duration header like "6m0s" into seconds."""
+    if not value:
+        return None
+    parts = _DURATION_RE.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+
+def _idempotency_headers() -> Dict[str, str]:
+    """
+    Build the Idempotency-Key header for one generation call.
+    
+    💡 Random, not a hash of the prompt: two separate calls with the same
+    prompt are two images the user asked for, and must not be merged.
+    """
+    return {"Idempotency-Key": uuid.uuid4().hex}
+
+
+def _is_retryable(error: BaseException) -> bool:
+    """Return True for errors that are worth retrying."""
+    return isinstance(error, RETRYABLE_ERRORS)
+
+
+def _retry_after_seconds(error: Optional[BaseException]) -> Optional[float]:
+    """Read the server's Retry-After header (in seconds) from an API error."""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    
+    retry_after = response.headers.get("retry-after")
+    if retry_after is None:
+        return None
+    
+    try:
+        return max(float(retry_after), 0.0)
+    except ValueError:
+        # HTTP-date form - fall back to our own backoff
+        return None
+
+
+def _wait_for_retry(retry_state: RetryCallState) -> float:
+    """
+    Wait as long as the server asked (up to MAX_RETRY_WAIT), or back off.
+    
+    💡 A "Retry-After: 3600" would otherwise park a worker for an hour on
+    every attempt; capping it keeps a stuck request from hanging the app.
+    """
+    retry_after = _retry_after_seconds(retry_state.outcome.exception())
+    if retry_after is not None:
+        return min(retry_after, MAX_RETRY_WAIT)
+    return _backoff(retry_state)
+
+
 # ============================================================================
 # THE CLIENT CLASS: Our Messenger to OpenAI
 # ============================================================================
@@ -102,7 +221,13 @@ class ImageGenerationClient:
     4. Follows industry patterns (easier for others to understand)
     """
     
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        max_retries: int = 5,
+        requests_per_minute: Optional[float] = 50,
+        burst: Optional[float] = None
+    ):
         """
         Initialize the image generation client.
         
@@ -116,7 +241,7 @@ class ImageGenerationClient:
         
         EXAMPLE USAGE:
         >>> # Option 1: Explicit key (for testing)
-        >>> client = ImageGenerationClient(api_key="sk-test-123")
+        >>> client = ImageGenerationClient(api_key="sk-test-" + "0" * 32)
         >>> 
         >>> # Option 2: From environment (for production)
         >>> # Assumes .env has OPENAI_API_KEY=sk-abc...
@@ -134,9 +259,15 @@ class ImageGenerationClient:
         Args:
             api_key: OpenAI API key. If None, will load from OPENAI_API_KEY
                     environment variable.
+            max_retries: How many times to retry a rate-limited or
+                    interrupted image request (default: 5)
+            requests_per_minute: Client-side cap on image requests per
+                    minute (default: 50). None disables throttling.
+            burst: How many requests may go out back-to-back before the
+                    cap kicks in (default: requests_per_minute)
             
         Raises:
-            ValueError: If no API key is provided or found
+            ValueError: If no API key is provided or found, or it is malformed
         """
         # Try explicit key first, fall back to environment
         self.api_key = api_key or os.getenv("OPENAI_API_KEY")
@@ -151,9 +282,39 @@ class ImageGenerationClient:
                 "OPENAI_API_KEY environment variable"
             )
         
+        # A malformed key would only fail later with a 401 - fail now instead
+        if not self.validate_api_key():
+            raise ValueError(
+                "API key is malformed - expected 'sk-...' with no spaces. "
+                "Check the OPENAI_API_KEY value in your .env file"
+            )
+        
         # Create the official OpenAI client
         # This handles HTTPS, retries, timeouts automatically
-        self.client = OpenAI(api_key=self.api_key)
+        # (over a pooled HTTP/2 connection - see HTTP_LIMITS above)
+        self.client = OpenAI(
+            api_key=self.api_key,
+            http_client=DefaultHttpxClient(http2=True, limits=HTTP_LIMITS)
+        )
+        
+        # Image requests use our own retry policy (see _retrying), so the
+        # SDK's built-in retries are turned off for them to avoid retrying twice
+        self.max_retries = max_retries
+        self._images_client = self.client.with_options(max_retries=0)
+        
+        # Throttle locally instead of finding out about the quota via a 429
+        self._bucket = None
+        self._base_rate = None
+        if requests_per_minute:
+            self._base_rate = requests_per_minute / 60
+            self._bucket = TokenBucket(
+                rate=self._base_rate,
+                capacity=burst or requests_per_minute
+            )
+    
+    def close(self) -> None:
+        """Close the pooled HTTP connection to OpenAI."""
+        self.client.close()
     
     def validate_api_key(self) -> bool:
         """
@@ -174,14 +335,16 @@ class ImageGenerationClient:
         💡 OpenAI Key Format:
         ---------------------
         All OpenAI API keys:
-        - Start with "sk-" (secret key)
-        - Are around 48-50 characters long
-        - Contain alphanumeric characters
+        - Start with "sk-" (secret key) or "sk-proj-" (project key)
+        - Are followed by 32+ letters, digits, "_" or "-"
+        - Contain no whitespace
+        
+        The constructor calls this for you and refuses malformed keys.
         
         EXAMPLE USAGE:
-        >>> client = ImageGenerationClient(api_key="invalid")
-        >>> if not client.validate_api_key():
-        ...     print("Key looks wrong - check your .env file!")
+        >>> client.api_key = "sk-abc123\n"  # pasted with a trailing newline
+        >>> client.validate_api_key()
+        False
         
         Returns:
             True if key appears valid, False otherwise
@@ -189,7 +352,7 @@ class ImageGenerationClient:
         ⚠️ NOTE: This only checks FORMAT, not if the key actually works.
                  A well-formatted key might still be expired/revoked.
         """
-        return self.api_key.startswith("sk-") and len(self.api_key) > 20
+        return bool(_API_KEY_RE.fullmatch(self.api_key))
     
     def generate_image(self, prompt: str, options: Optional[ImageOptions] = None) -> Dict[str, Any]:
         """
@@ -207,7 +370,7 @@ class ImageGenerationClient:
             ImageError: If API request fails
         """
         # Validate prompt
-        if not prompt or not prompt.strip():
+        if not prompt or prompt.isspace():
             raise ValueError("Prompt cannot be empty")
         
         if len(prompt) > 4000:
@@ -220,47 +383,221 @@ class ImageGenerationClient:
         # Construct request payload
         payload = self._construct_payload(prompt, options)
         
+        # One key per call, reused by every retry of that call
+        headers = _idempotency_headers()
+        
         try:
-            # Make API request
-            response = self.client.images.generate(**payload)
+            # Make API request (retrying transient failures)
+            response = self._retrying(Retrying)(self._request_image, payload, headers)
             
             # Convert response to dictionary
             return self._response_to_dict(response)
             
-        except AuthenticationError as e:
-            raise ImageError(
+        except Exception as e:
+            raise self._translate_error(e)
+    
+    async def generate_image_async(
+        self,
+        prompt: str,
+        options: Optional[ImageOptions] = None,
+        session: Optional[AsyncOpenAI] = None
+    ) -> Dict[str, Any]:
+        """
+        Generate an image using OpenAI's DALL-E API without blocking the event loop.
+        
+        📚 CONCEPT: Async I/O
+        ---------------------
+        Image generation is almost entirely waiting on the network. While one
+        request is in flight, an ``await`` lets the event loop start others,
+        so N prompts take roughly as long as the slowest one instead of the
+        sum of all of them.
+        
+        Args:
+            prompt: The text prompt describing the desired image
+            options: Optional image generation configuration
+            session: Shared AsyncOpenAI client (see ``async_session``). If None,
+                     a temporary one is created and closed for this call.
+            
+        Returns:
+            Raw API response dictionary
+            
+        Raises:
+            ValueError: If prompt is invalid
+            ImageError: If API request fails
+        """
+        if not prompt or prompt.isspace():
+            raise ValueError("Prompt cannot be empty")
+        
+        if len(prompt) > 4000:
+            raise ValueError("Prompt too long (max 4000 characters)")
+        
+        if options is None:
+            options = ImageOptions()
+        
+        payload = self._construct_payload(prompt, options)
+        headers = _idempotency_headers()
+        
+        owns_session = session is None
+        if owns_session:
+            session = self.async_session()
+        
+        try:
+            response = await self._retrying(AsyncRetrying)(
+                self._request_image_async, session, payload, headers
+            )
+            return self._response_to_dict(response)
+        except Exception as e:
+            raise self._translate_error(e)
+        finally:
+            if owns_session:
+                await session.close()
+    
+    def async_session(self) -> AsyncOpenAI:
+        """
+        Create an AsyncOpenAI client for a batch of async requests.
+        
+        💡 WHY NOT CREATE IT IN __init__?
+        ---------------------------------
+        Async HTTP connections belong to the event loop that opened them.
+        Each ``asyncio.run()`` starts a new loop, so the session should live
+        exactly as long as one batch:
+        
+        >>> async with client.async_session() as session:
+        ...     await client.generate_image_async("A cat", session=session)
+        
+        Returns:
+            A new AsyncOpenAI client using this client's API key
+        """
+        return AsyncOpenAI(
+            api_key=self.api_key,
+            max_retries=0,
+            http_client=DefaultAsyncHttpxClient(http2=True, limits=HTTP_LIMITS)
+        )
+    
+    def _request_image(self, payload: Dict[str, Any], headers: Dict[str, str]) -> Any:
+        """Send one image request, waiting for a rate-limit token first."""
+        if self._bucket is not None:
+            self._bucket.acquire()
+        raw_response = self._images_client.images.with_raw_response.generate(
+            **payload, extra_headers=headers
+        )
+        self._adapt_rate(raw_response.headers)
+        return raw_response.parse()
+    
+    async def _request_image_async(
+        self,
+        session: AsyncOpenAI,
+        payload: Dict[str, Any],
+        headers: Dict[str, str]
+    ) -> Any:
+        """Async version of ``_request_image``."""
+        if self._bucket is not None:
+            await self._bucket.acquire_async()
+        raw_response = await session.images.with_raw_response.generate(
+            **payload, extra_headers=headers
+        )
+        self._adapt_rate(raw_response.headers)
+        return raw_response.parse()
+    
+    def _adapt_rate(self, headers: Any) -> None:
+        """
+        Slow down before the quota runs out, using OpenAI's rate-limit headers.
+        
+        📚 CONCEPT: Adaptive Throttling
+        -------------------------------
+        Every response tells us how many requests are left in the current
+        window (x-ratelimit-remaining-requests) and when it resets
+        (x-ratelimit-reset-requests). Spreading the remaining requests over
+        the time left means we glide into the limit instead of hitting a
+        wall of 429s. We never go faster than the configured rate, and we
+        return to it once the window has plenty of room again. The burst
+        we've saved up is trimmed to what's left too, or it would all go
+        out at once.
+        
+        Args:
+            headers: HTTP response headers from the images API
+        """
+        if self._bucket is None:
+            return
+        
+        reset_seconds = _parse_duration(headers.get("x-ratelimit-reset-requests"))
+        try:
+            remaining = int(headers.get("x-ratelimit-remaining-requests"))
+        except (TypeError, ValueError):
+            return
+        if not reset_seconds:
+            return
+        
+        self._bucket.rate = min(self._base_rate, max(remaining, 1) / reset_seconds)
+        self._bucket.limit_tokens(remaining)
+    
+    def _retrying(self, retrying_class):
+        """
+        Build the retry controller for one image request.
+        
+        Retries rate limits, connection errors, timeouts and 5xx server
+        errors with exponential backoff (honoring Retry-After). Authentication and content policy
+        errors fail immediately - retrying them would never help. Every
+        attempt, retries included, waits for a rate-limit token first.
+        
+        Args:
+            retrying_class: tenacity.Retrying or tenacity.AsyncRetrying
+            
+        Returns:
+            A callable that runs a function under the retry policy
+        """
+        return retrying_class(
+            retry=retry_if_exception(_is_retryable),
+            wait=_wait_for_retry,
+            stop=stop_after_attempt(self.max_retries + 1),
+            reraise=True
+        )
+    
+    def _translate_error(self, error: Exception) -> ImageError:
+        """
+        Translate an OpenAI SDK exception into our domain ImageError.
+        
+        Shared by the sync and async generation paths so both report
+        failures with the same error codes.
+        
+        Args:
+            error: Exception raised while calling the images API
+            
+        Returns:
+            ImageError describing the failure
+        """
+        if isinstance(error, AuthenticationError):
+            return ImageError(
                 code="AUTHENTICATION_ERROR",
                 message="Invalid API key or authentication failed",
-                details={"original_error": str(e)}
+                details={"original_error": str(error)}
             )
-        except RateLimitError as e:
-            raise ImageError(
+        if isinstance(error, RateLimitError):
+            return ImageError(
                 code="RATE_LIMIT_ERROR", 
                 message="API rate limit exceeded",
-                details={"original_error": str(e)}
+                details={"original_error": str(error)}
             )
-        except APIError as e:
+        if isinstance(error, APIError):
             # Check if it's a content policy violation
-            error_msg = str(e).lower()
+            error_msg = str(error).lower()
             if "content policy" in error_msg or "safety" in error_msg:
-                raise ImageError(
+                return ImageError(
                     code="CONTENT_POLICY_ERROR",
                     message="Prompt violates OpenAI's content policy",
-                    details={"original_error": str(e)}
-                )
-            else:
-                raise ImageError(
-                    code="API_ERROR",
-                    message=f"API request failed: {str(e)}",
-                    details={"original_error": str(e)}
+                    details={"original_error": str(error)}
                 )
-        except Exception as e:  # pragma: no cover
-            # Defensive fallback - should not be reached in normal operation
-            raise ImageError(
-                code="UNKNOWN_ERROR",
-                message=f"Unexpected error: {str(e)}",
-                details={"original_error": str(e)}
+            return ImageError(
+                code="API_ERROR",
+                message=f"API request failed: {str(error)}",
+                details={"original_error": str(error)}
             )
+        # Defensive fallback - should not be reached in normal operation
+        return ImageError(
+            code="UNKNOWN_ERROR",
+            message=f"Unexpected error: {str(error)}",
+            details={"original_error": str(error)}
+        )
     
     def _construct_payload(self, prompt: str, options: ImageOptions) -> Dict[str, Any]:
         """
@@ -273,55 +610,24 @@ class ImageGenerationClient:
         Returns:
             Dictionary payload for API request
         """
-        payload = {
-            "model": options.model,
-            "prompt": prompt,
-            "size": options.size,
-            "response_format": options.response_format,
-            "n": options.n
-        }
-        
-        # Add quality setting for DALL-E 3
-        if options.model == "dall-e-3" and options.quality:
-            payload["quality"] = options.quality
-        
-        # Add style setting for DALL-E 3
-        if options.model == "dall-e-3" and options.style:
-            payload["style"] = options.style
-        
-        return payload
+        # Model, size, quality, style... come from a cached per-options template
+        return {**options.to_payload_template(), "prompt": prompt}
     
     def _response_to_dict(self, response: Any) -> Dict[str, Any]:
         """
         Convert OpenAI response object to dictionary.
         
+        The SDK's responses are Pydantic models, so ``model_dump()`` builds
+        the whole dictionary in one call (in compiled code) instead of us
+        probing each image's attributes one by one.
+        
         Args:
             response: OpenAI image generation response object
             
         Returns:
-            Dictionary representation of response
+            Dictionary representation of response (unset fields omitted)
         """
-        result = {
-            "created": getattr(response, 'created', 0),
-            "data": []
-        }
-        
-        # Convert image data
-        for image in response.data:
-            image_dict = {}
-            
-            if hasattr(image, 'url'):
-                image_dict["url"] = image.url
-            
-            if hasattr(image, 'b64_json'):
-                image_dict["b64_json"] = image.b64_json
-            
-            if hasattr(image, 'revised_prompt'):
-                image_dict["revised_prompt"] = image.revised_prompt
-            
-            result["data"].append(image_dict)
-        
-        return result
+        return response.model_dump(exclude_none=True)
 
     def decompose_story(self, story_options: StoryOptions) -> List[StoryScene]:
         """
@@ -370,8 +676,7 @@ Output format: Return a JSON array with {story_options.num_scenes} objects, each
             )
 
             # Parse the JSON response
-            import json
-            story_data = json.loads(response.choices[0].message.content)
+            story_data = orjson.loads(response.choices[0].message.content)
             
             # Convert to StoryScene objects
             scenes = []
@@ -403,7 +708,7 @@ Output format: Return a JSON array with {story_options.num_scenes} objects, each
 
             return scenes
 
-        except json.JSONDecodeError as e:
+        except orjson.JSONDecodeError as e:
             raise ImageError(
                 "STORY_PARSING_ERROR",
                 f"Failed to parse GPT response as JSON: {str(e)}"
@@ -0,0 +1,448 @@
+"""
+Getting generated images onto disk: naming files and downloading them.
+
+The service decides WHAT to generate; this module handles the file side of
+things so the service doesn't have to:
+
+- FilenameGenerator turns a prompt into a safe, sortable filename
+- ImageDownloader streams an image URL into that file, sync or async
+
+Think of it like a photo lab: the photographer (the service) hands over
+the film, and the lab develops, labels and files each print.
+"""
+
+import asyncio
+import itertools
+import os
+import re
+import shutil
+import threading
+from datetime import datetime
+from typing import BinaryIO, Optional, Set, TYPE_CHECKING
+
+import httpx
+
+# requests is imported where it's first used, so importing this module
+# (e.g. just to build a service for async work) doesn't pay for it
+if TYPE_CHECKING:
+    import requests
+
+from src.client import MAX_RETRY_WAIT
+from src.models import ImageError, ImageResult
+
+
+# Compiled once at import time - make_filename runs on every saved image
+_NONWORD_RE = re.compile(r'[^\w\s-]')
+_SPACE_RE = re.compile(r'[-\s]+')
+
+# Filename cleaning for plain-ASCII prompts in a single str.translate() pass:
+# letters, digits and "_" are kept, spaces and "-" become "_", everything
+# else is dropped. Runs of "_" are then collapsed by _UNDERSCORES_RE.
+_SAFE_TRANS = str.maketrans({
+    c: ('_' if c.isspace() or c == '-' else None)
+    for c in map(chr, range(128))
+    if not (c.isalnum() or c == '_')
+})
+_UNDERSCORES_RE = re.compile(r'_{2,}')
+
+
+def _discard_partial(path: str) -> None:
+    """Remove a half-written download, if there is one."""
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class FilenameGenerator:
+    """
+    Builds filesystem-safe image filenames that sort in generation order.
+
+    EXAMPLE USAGE:
+    >>> filenames = FilenameGenerator()
+    >>> filenames.make_filename("A space cat!", "gen-abc123")
+    'a_space_cat_20251027_141556_000001_gen-abc123.png'
+    """
+
+    def __init__(self):
+        # Stamp shared by the files of the batches in progress, and how many
+        # batches that is; outside of one, each file gets the current time
+        self._batch_stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self._batch_depth = 0
+        self._lock = threading.Lock()
+        self._seq = itertools.count(1)
+
+    def make_filename(self, prompt: str, generation_id: str) -> str:
+        """
+        Generate a safe filename from a prompt and generation ID.
+
+        📚 CONCEPT: Defensive Programming
+        ---------------------------------
+        User prompts can contain characters that aren't safe for filenames:
+        - Spaces, special characters, unicode
+        - Very long prompts
+        - System-reserved names
+
+        This method creates clean, filesystem-safe filenames.
+
+        Args:
+            prompt: The original image prompt
+            generation_id: Unique identifier for this generation
+
+        Returns:
+            Safe filename with .png extension
+
+        💡 ORDERING: Inside a batch (see ``start_batch``) every file shares
+        the timestamp taken when the batch started, and each file gets the
+        next sequence number, so files from one batch sort in the order they
+        were generated. A single ``generate_image`` call outside a batch is
+        stamped with the current time.
+
+        Example:
+            prompt = "A cat wearing a space helmet!"
+            generation_id = "gen-abc123"
+            result = "a_cat_wearing_a_space_helmet_20251027_141556_000001_gen-abc123.png"
+        """
+        # Clean the prompt: lowercase, replace spaces and special chars with underscores
+        clean_prompt = prompt.lower()
+        if clean_prompt.isascii():
+            # Common case: one C-level translate pass
+            clean_prompt = _UNDERSCORES_RE.sub('_', clean_prompt.translate(_SAFE_TRANS))
+        else:
+            # Unicode letters/punctuation need the regex definitions of \w and \s
+            clean_prompt = _NONWORD_RE.sub('', clean_prompt)
+            clean_prompt = _SPACE_RE.sub('_', clean_prompt)
+
+        # Truncate if too long (keep it under 50 chars for readability)
+        if len(clean_prompt) > 50:
+            clean_prompt = clean_prompt[:50].rstrip('_')
+
+        # Combine: prompt + batch timestamp + sequence number + generation_id
+        if self._batch_depth:
+            stamp = self._batch_stamp
+        else:
+            stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        filename = f"{clean_prompt}_{stamp}_{next(self._seq):06d}_{generation_id}.png"
+
+        return filename
+
+    def start_batch(self) -> None:
+        """
+        Mark the start of a batch of generations.
+
+        The timestamp is only refreshed when no other batch is running, so
+        overlapping batches (e.g. two web requests) don't re-stamp each
+        other's remaining files.
+        """
+        with self._lock:
+            if self._batch_depth == 0:
+                self._batch_stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            self._batch_depth += 1
+
+    def end_batch(self) -> None:
+        """Mark a batch as finished (pairs with ``start_batch``)."""
+        with self._lock:
+            self._batch_depth -= 1
+
+
+class ImageDownloader:
+    """
+    Downloads generated images and saves them to disk.
+
+    EXAMPLE USAGE:
+    >>> downloader = ImageDownloader()
+    >>> downloader.download(result, "generated_images/cat.png")
+    >>> await downloader.download_async(result, "generated_images/cat.png")
+    """
+
+    def __init__(self):
+        # One pooled HTTP session for image downloads, created on first use
+        self._http: Optional["requests.Session"] = None
+        self._lock = threading.Lock()
+
+        # Directories we've already created (see ensure_dir)
+        self._known_dirs: Set[str] = set()
+
+    def _get_http(self) -> "requests.Session":
+        """
+        Get the HTTP session used to download generated images.
+
+        📚 CONCEPT: Connection Reuse (Keep-Alive)
+        -----------------------------------------
+        ``requests.get()`` opens a brand-new connection every time, paying a
+        TCP + TLS handshake before the first byte arrives. All DALL-E images
+        live on the same blob storage host, so a Session keeps connections
+        open and reuses them - like keeping a phone line open instead of
+        redialing for every sentence.
+
+        The mounted adapter also retries transient failures (429, 5xx)
+        with exponential backoff, honoring the server's Retry-After header
+        up to MAX_RETRY_WAIT - same rule as the API client.
+
+        Returns:
+            Configured requests.Session (created on first call)
+        """
+        with self._lock:
+            if self._http is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                from urllib3.util.retry import Retry
+
+                class CappedRetry(Retry):
+                    """Retry that never sleeps longer than MAX_RETRY_WAIT for Retry-After."""
+
+                    def get_retry_after(self, response):
+                        retry_after = super().get_retry_after(response)
+                        if retry_after is None:
+                            return None
+                        return min(retry_after, MAX_RETRY_WAIT)
+
+                retries = CappedRetry(
+                    total=5,
+                    backoff_factor=0.5,
+                    status_forcelist=[429, 500, 502, 503, 504],
+                    respect_retry_after_header=True
+                )
+                adapter = HTTPAdapter(pool_connections=16, pool_maxsize=16, max_retries=retries)
+
+                session = requests.Session()
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                self._http = session
+            return self._http
+
+    def close(self) -> None:
+        """Release pooled download connections."""
+        if self._http is not None:
+            self._http.close()
+
+    def download(
+        self,
+        result: ImageResult,
+        save_path: str,
+        keep_bytes: bool = False
+    ) -> ImageResult:
+        """
+        Download an image from URL and save to file.
+
+        📚 CONCEPT: Side Effects and Immutability
+        -----------------------------------------
+        This method modifies the ImageResult object (adds file_path and image_data).
+        In a more functional style, we'd return a new object. But for simplicity
+        and performance, we modify the existing one.
+
+        💡 STREAMING: Why not just use response.content?
+        ------------------------------------------------
+        ``response.content`` holds the whole image in memory before we write
+        it - for a multi-megabyte HD image that doubles peak memory. Instead
+        we copy the response to disk 64 KB at a time. The bytes are only
+        kept in memory when the caller asks for them with ``keep_bytes``.
+
+        ⚠️ The download goes to ``<save_path>.part`` first and is renamed
+        into place only once it's complete, so a dropped connection never
+        leaves a truncated image under the real name.
+
+        Args:
+            result: ImageResult with image_url
+            save_path: Where to save the image file
+            keep_bytes: Also store the image bytes on ``result.image_data``
+                        (default: False - the file on disk is enough)
+
+        Returns:
+            Updated ImageResult with image saved to file
+
+        Raises:
+            ImageError: If download or save fails
+        """
+        if not result.image_url:
+            raise ImageError(
+                code="DOWNLOAD_ERROR",
+                message="No image URL available for download",
+                details={"result": str(result)}
+            )
+
+        import requests
+        import urllib3
+
+        part_path = save_path + ".part"
+
+        try:
+            # Start the download, but don't read the body yet
+            response = self._get_http().get(result.image_url, timeout=30, stream=True)
+
+            # "with" returns the connection to the pool even on a 4xx/5xx,
+            # whose body we never read
+            with response:
+                response.raise_for_status()
+
+                if keep_bytes:
+                    # Caller wants the bytes anyway - read once, write once
+                    result.image_data = response.content
+                    with self.open_for_write(part_path) as f:
+                        f.write(result.image_data)
+                else:
+                    # Stream straight to disk in 64 KB chunks - each chunk goes
+                    # from the socket read buffer to the file with no full-image
+                    # copy; result.read_image_data() maps the file if needed later.
+                    # decode_content undoes any gzip/deflate transfer encoding.
+                    response.raw.decode_content = True
+                    with self.open_for_write(part_path) as f:
+                        shutil.copyfileobj(response.raw, f, length=1 << 16)
+
+            # Complete - move it to its real name in one step
+            os.replace(part_path, save_path)
+
+            # Update result with file path
+            result.file_path = save_path
+
+            return result
+
+        except (requests.RequestException, urllib3.exceptions.HTTPError) as e:
+            _discard_partial(part_path)
+            raise ImageError(
+                code="DOWNLOAD_ERROR",
+                message=f"Failed to download image: {str(e)}",
+                details={"url": result.image_url, "error": str(e)}
+            )
+        except OSError as e:
+            _discard_partial(part_path)
+            raise ImageError(
+                code="SAVE_ERROR",
+                message=f"Failed to save image: {str(e)}",
+                details={"save_path": save_path, "error": str(e)}
+            )
+
+    async def download_async(
+        self,
+        result: ImageResult,
+        save_path: str,
+        http: Optional[httpx.AsyncClient] = None,
+        keep_bytes: bool = False
+    ) -> ImageResult:
+        """
+        Async sibling of ``download``.
+
+        The body is streamed in 64 KB chunks on the event loop, and each
+        chunk is written to disk from a worker thread. Blocking file I/O
+        never stalls the loop, so the other downloads in a batch keep going
+        while one image is being written. As in the sync version, the file
+        only gets its real name once the download is complete.
+
+        Args:
+            result: ImageResult with image_url
+            save_path: Where to save the image file
+            http: Shared httpx.AsyncClient. If None, a temporary one is used.
+            keep_bytes: Also store the image bytes on ``result.image_data``
+                        (default: False - the file on disk is enough)
+
+        Returns:
+            Updated ImageResult with image saved to file
+
+        Raises:
+            ImageError: If download or save fails
+        """
+        if not result.image_url:
+            raise ImageError(
+                code="DOWNLOAD_ERROR",
+                message="No image URL available for download",
+                details={"result": str(result)}
+            )
+
+        owns_http = http is None
+        if owns_http:
+            http = httpx.AsyncClient(timeout=30)
+
+        part_path = save_path + ".part"
+
+        try:
+            async with http.stream("GET", result.image_url) as response:
+                response.raise_for_status()
+
+                if keep_bytes:
+                    # Caller wants the bytes anyway - read once, write once
+                    result.image_data = await response.aread()
+                    await asyncio.to_thread(self.write_file, part_path, result.image_data)
+                else:
+                    f = await asyncio.to_thread(self.open_for_write, part_path)
+                    try:
+                        async for chunk in response.aiter_bytes(1 << 16):
+                            await asyncio.to_thread(f.write, chunk)
+                    finally:
+                        await asyncio.to_thread(f.close)
+
+            await asyncio.to_thread(os.replace, part_path, save_path)
+            result.file_path = save_path
+
+            return result
+
+        except httpx.HTTPError as e:
+            _discard_partial(part_path)
+            raise ImageError(
+                code="DOWNLOAD_ERROR",
+                message=f"Failed to download image: {str(e)}",
+                details={"url": result.image_url, "error": str(e)}
+            )
+        except OSError as e:
+            _discard_partial(part_path)
+            raise ImageError(
+                code="SAVE_ERROR",
+                message=f"Failed to save image: {str(e)}",
+                details={"save_path": save_path, "error": str(e)}
+            )
+        finally:
+            if owns_http:
+                await http.aclose()
+
+    def copy_file(self, source_path: str, save_path: str) -> None:
+        """
+        Copy a saved image to a new location, the same safe way we download.
+
+        Raises:
+            ImageError: SAVE_ERROR if the copy fails
+        """
+        part_path = save_path + ".part"
+        try:
+            with open(source_path, 'rb') as src, self.open_for_write(part_path) as dst:
+                shutil.copyfileobj(src, dst)
+            os.replace(part_path, save_path)
+        except OSError as e:
+            _discard_partial(part_path)
+            raise ImageError(
+                code="SAVE_ERROR",
+                message=f"Failed to save image: {str(e)}",
+                details={"save_path": save_path, "error": str(e)}
+            )
+
+    def write_file(self, save_path: str, data: bytes) -> None:
+        """Write image bytes to disk, creating the parent directory if needed."""
+        with self.open_for_write(save_path) as f:
+            f.write(data)
+
+    def open_for_write(self, path: str) -> BinaryIO:
+        """
+        Open a file for writing, creating its directory if needed.
+
+        If a directory we remembered has since been deleted (say someone
+        cleared out generated_images/ while the app is running), forget it,
+        create it again and retry once.
+        """
+        directory = os.path.dirname(path)
+        self.ensure_dir(directory)
+        try:
+            return open(path, 'wb')
+        except FileNotFoundError:
+            self._known_dirs.discard(directory)
+            self.ensure_dir(directory)
+            return open(path, 'wb')
+
+    def ensure_dir(self, directory: str) -> None:
+        """
+        Create a directory the first time we save into it.
+
+        💡 Saving 100 images to one folder shouldn't ask the filesystem 100
+        times whether that folder exists - we remember the ones we've made.
+        ``open_for_write`` notices if one of them disappears later.
+        """
+        if directory and directory not in self._known_dirs:
+            os.makedirs(directory, exist_ok=True)
+            self._known_dirs.add(directory)
@@ -23,9 +23,14 @@ LEARNING OBJECTIVES:
 ✓ Appreciate immutability and data validation
 """
 
-from dataclasses import dataclass
+import mmap
+import os
+from concurrent.futures import Future
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Optional, List, Dict, Any, Union
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Optional, List, Dict, Any, Mapping, Union
 
 
 # ============================================================================
@@ -83,6 +88,49 @@ class ImageOptions:
     
     # Number of images to generate (1-10 for dall-e-2, only 1 for dall-e-3)
     n: int = 1
+    
+    def to_payload_template(self) -> Mapping[str, Any]:
+        """
+        Get the API request fields for these options (everything but the prompt).
+        
+        💡 WHY CACHE?
+        -------------
+        A batch usually shares one ImageOptions across many prompts. The
+        template is built once per distinct combination of settings and
+        reused; it's read-only so nobody can accidentally change it for
+        everyone else.
+        
+        EXAMPLE USAGE:
+        >>> payload = {**options.to_payload_template(), "prompt": "A space cat"}
+        
+        Returns:
+            Read-only mapping of request fields
+        """
+        return _payload_template(
+            self.model, self.size, self.quality, self.style, self.response_format, self.n
+        )
+
+
+@lru_cache(maxsize=64)
+def _payload_template(
+    model: str, size: str, quality: str, style: str, response_format: str, n: int
+) -> Mapping[str, Any]:
+    """Build (and cache) the request fields for one combination of options."""
+    payload = {
+        "model": model,
+        "size": size,
+        "response_format": response_format,
+        "n": n
+    }
+    
+    # Quality and style are DALL-E 3 only settings
+    if model == "dall-e-3":
+        if quality:
+            payload["quality"] = quality
+        if style:
+            payload["style"] = style
+    
+    return MappingProxyType(payload)
 
 
 # ============================================================================
@@ -261,11 +309,44 @@ class ImageResult:
     # When this generation was completed
     timestamp: datetime = None
     
+    # Set by ImageGenerationService.submit_generation (see wait_saved)
+    _download_future: Optional[Future] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+    
     def __post_init__(self):
         """Set timestamp to current time if not provided."""
         if self.timestamp is None:
             self.timestamp = datetime.now()
     
+    def __getstate__(self) -> Dict[str, Any]:
+        """Pickle without the pending download (futures can't be pickled)."""
+        state = self.__dict__.copy()
+        state["_download_future"] = None
+        return state
+    
+    def wait_saved(self, timeout: Optional[float] = None) -> "ImageResult":
+        """
+        Wait for a background download started by ``submit_generation``.
+        
+        EXAMPLE USAGE:
+        >>> pending = [service.submit_generation(p) for p in prompts]
+        >>> for result in pending:
+        ...     print(result.wait_saved().file_path)
+        
+        Args:
+            timeout: Seconds to wait before giving up (default: wait forever)
+            
+        Returns:
+            This ImageResult, now saved to disk
+            
+        Raises:
+            ImageError: If the background download or save failed
+        """
+        if self._download_future is not None:
+            self._download_future.result(timeout)
+        return self
+    
     @property
     def is_downloaded(self) -> bool:
         """
@@ -277,8 +358,43 @@ class ImageResult:
         - Download immediately for long-term storage
         - Check if download is needed before displaying
         - Warn users about expiring links
+        
+        An image streamed straight to disk counts as downloaded even though
+        its bytes aren't held in memory.
+        """
+        return self.image_data is not None or self.file_path is not None
+    
+    def read_image_data(self) -> Optional[Union[bytes, mmap.mmap]]:
         """
-        return self.image_data is not None
+        Get the image bytes, from memory or from the saved file.
+        
+        💡 WHY MMAP?
+        ------------
+        Downloads stream straight to disk and skip ``image_data`` (see
+        ``download_and_save_image``). When someone does want the bytes, we
+        memory-map the saved file: the OS pages it in as it's read, with no
+        up-front copy into a Python bytes object. The result supports
+        ``len()``, slicing and anything that accepts bytes-like objects.
+        
+        ⚠️ The caller owns a returned ``mmap`` and must ``close()`` it when
+        done - an open mapping keeps the file held, which blocks deleting
+        it on Windows.
+        
+        Returns:
+            ``image_data`` if it's already in memory, a read-only memory map
+            of ``file_path`` if the image was saved, otherwise None
+        """
+        if self.image_data is not None:
+            return self.image_data
+        if not self.file_path or not os.path.exists(self.file_path):
+            return None
+        
+        with open(self.file_path, 'rb') as f:
+            # mmap can't map an empty file
+            if os.fstat(f.fileno()).st_size == 0:
+                return b""
+            # The mapping stays valid after the file is closed
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
     
     @property
     def is_saved(self) -> bool:
@@ -288,7 +404,11 @@ class ImageResult:
     @property
     def file_size(self) -> Optional[int]:
         """Get the size of the image data in bytes."""
-        return len(self.image_data) if self.image_data else None
+        if self.image_data:
+            return len(self.image_data)
+        if self.file_path and os.path.exists(self.file_path):
+            return os.path.getsize(self.file_path)
+        return None
     
     def __str__(self) -> str:
         """
@@ -0,0 +1,108 @@
+"""
+Client-side rate limiting for the image generation API.
+
+OpenAI enforces a requests-per-minute quota. When we go over it, the server
+answers with a 429 and we have to wait and retry - paying a full network
+round-trip for nothing. A token bucket lets us wait locally instead:
+
+- The bucket holds up to ``capacity`` tokens (the allowed burst)
+- Tokens refill continuously at ``rate`` tokens per second
+- Each request takes one token; if none are left, the caller sleeps
+  until one has refilled
+
+Think of it like a ticket dispenser at a deli counter: you can't be served
+faster than tickets come out, but you never waste a trip to the counter.
+"""
+
+import asyncio
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket usable from both threads and asyncio.
+
+    EXAMPLE USAGE:
+    >>> bucket = TokenBucket(rate=50 / 60, capacity=50)  # 50 requests/minute
+    >>> bucket.acquire()        # blocks until a token is available
+    >>> await bucket.acquire_async()  # same, without blocking the event loop
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        """
+        Initialize a full token bucket.
+
+        Args:
+            rate: Tokens added per second (must be positive)
+            capacity: Maximum number of tokens the bucket can hold
+
+        Raises:
+            ValueError: If rate or capacity is not positive
+        """
+        if rate <= 0 or capacity <= 0:
+            raise ValueError("Token bucket rate and capacity must be positive")
+
+        self._rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self) -> float:
+        """Tokens added per second."""
+        return self._rate
+
+    @rate.setter
+    def rate(self, value: float) -> None:
+        if value <= 0:
+            raise ValueError("Token bucket rate must be positive")
+        with self._lock:
+            # Credit tokens earned at the old rate before switching
+            self._refill()
+            self._rate = value
+
+    def limit_tokens(self, tokens: float) -> None:
+        """
+        Cap the tokens currently in the bucket.
+        
+        Lowering ``rate`` only slows the refill; tokens already banked would
+        still go out immediately. When the server says only ``tokens``
+        requests are left, we drop anything above that.
+        """
+        with self._lock:
+            self._refill()
+            self._tokens = min(self._tokens, tokens)
+    
+    def acquire(self, tokens: float = 1) -> None:
+        """Take tokens from the bucket, sleeping until they are available."""
+        wait = self._reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens: float = 1) -> None:
+        """Take tokens from the bucket without blocking the event loop."""
+        wait = self._reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def _reserve(self, tokens: float) -> float:
+        """
+        Claim tokens and return how long the caller must wait for them.
+
+        The balance may go negative: each caller reserves its place in line
+        and sleeps outside the lock, so waiting callers are served in order.
+        """
+        with self._lock:
+            self._refill()
+            self._tokens -= tokens
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self._rate
+
+    def _refill(self) -> None:
+        """Add tokens earned since the last update (caller holds the lock)."""
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self._rate)
+        self._updated_at = now
@@ -39,13 +39,25 @@ LEARNING OBJECTIVES:
 ✓ Appreciate clean architecture principles
 """
 
+import asyncio
+import dataclasses
+import hashlib
 import os
 import re
-import requests
-from typing import Optional, List
+import threading
+import httpx
+import orjson
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, List, TYPE_CHECKING
 from datetime import datetime
 
+# diskcache is imported where it's first used, so importing this module
+# (e.g. just to build ImageOptions) doesn't pay for it
+if TYPE_CHECKING:
+    import diskcache
+
 from src.client import ImageGenerationClient
+from src.image_files import FilenameGenerator, ImageDownloader
 from src.parser import ImageResponseParser
 from src.models import (
     ImageOptions, ImageResult, ImageError, 
@@ -53,6 +65,12 @@ from src.models import (
 )
 
 
+# Potentially problematic content (basic - real filtering would be more sophisticated).
+# IGNORECASE lets one pass scan the prompt without building a lowercase copy.
+_BANNED_RE = re.compile(r'violence|gore|explicit', re.IGNORECASE)
+
+
+
 class ImageGenerationService:
     """
     Service for coordinating image generation operations.
@@ -86,7 +104,12 @@ class ImageGenerationService:
     ❌ BAD:  service always uses production API key
     """
     
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        max_concurrency: int = 5,
+        cache_dir: Optional[str] = ".image_cache"
+    ):
         """
         Initialize the image generation service.
         
@@ -100,6 +123,11 @@ class ImageGenerationService:
         
         Args:
             api_key: OpenAI API key
+            max_concurrency: Maximum number of in-flight requests for
+                             ``generate_images_async`` (default: 5)
+            cache_dir: Where to remember past generations so repeated
+                       prompts skip the API (default: ".image_cache").
+                       None disables the cache.
             
         Raises:
             ValueError: If no API key is provided
@@ -110,8 +138,53 @@ class ImageGenerationService:
         # Compose our dependencies
         self.client = ImageGenerationClient(api_key=api_key)
         self.parser = ImageResponseParser()
+        
+        # How many async generations may run at once (see generate_images_async)
+        self.max_concurrency = max_concurrency
+        
+        # Naming and downloading of saved images (see src/image_files.py)
+        self.filenames = FilenameGenerator()
+        self.downloader = ImageDownloader()
+        
+        # Guards lazy creation of the cache and download pool
+        self._lazy_lock = threading.Lock()
+        
+        # Cache of saved generations, opened on first use
+        self.cache_dir = cache_dir
+        self._cache: Optional["diskcache.Cache"] = None
+        
+        # Background download workers for submit_generation, started on first use
+        self._dl_pool: Optional[ThreadPoolExecutor] = None
     
-    def generate_image(self, prompt: str, options: Optional[ImageOptions] = None, auto_save: bool = True, save_dir: str = "generated_images") -> ImageResult:
+    def close(self) -> None:
+        """
+        Release pooled network connections.
+        
+        EXAMPLE USAGE:
+        >>> with ImageGenerationService(api_key="sk-...") as service:
+        ...     service.generate_image("A space cat")
+        """
+        if self._dl_pool is not None:
+            self._dl_pool.shutdown(wait=True)
+        self.downloader.close()
+        self.client.close()
+        if self._cache is not None:
+            self._cache.close()
+    
+    def __enter__(self) -> "ImageGenerationService":
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+    
+    def generate_image(
+        self,
+        prompt: str,
+        options: Optional[ImageOptions] = None,
+        auto_save: bool = True,
+        save_dir: str = "generated_images",
+        use_cache: bool = True
+    ) -> ImageResult:
         """
         Generate an image from a text prompt.
         
@@ -136,6 +209,8 @@ class ImageGenerationService:
             options: Optional generation configuration
             auto_save: Whether to automatically download and save the image (default: True)
             save_dir: Directory to save images in (default: "generated_images")
+            use_cache: Reuse a previously saved image for the same prompt and
+                       options instead of calling the API (default: True)
             
         Returns:
             ImageResult with generated image data and local file path
@@ -152,6 +227,14 @@ class ImageGenerationService:
         if options is None:
             options = ImageOptions()
         
+        # Step 2.5: Same prompt + options as before? Reuse the saved image
+        cache_key = None
+        if use_cache and self.cache_dir:
+            cache_key = self._cache_key(prompt, options)
+            cached = self._get_cached_result(cache_key, auto_save, save_dir)
+            if cached is not None:
+                return cached
+        
         try:
             # Step 3: Call external service
             raw_response = self.client.generate_image(prompt, options)
@@ -168,6 +251,10 @@ class ImageGenerationService:
                 # Download and save the image
                 result = self.download_and_save_image(result, save_path)
             
+            # Only saved images are cached - OpenAI's URLs expire after a while
+            if cache_key is not None and result.file_path:
+                self._get_cache().set(cache_key, result)
+            
             return result
             
         except ImageError:
@@ -181,6 +268,307 @@ class ImageGenerationService:
                 details={"original_error": str(e)}
             )
     
+    def _get_cache(self) -> "diskcache.Cache":
+        """Open the generation cache on first use."""
+        with self._lazy_lock:
+            if self._cache is None:
+                import diskcache
+                self._cache = diskcache.Cache(self.cache_dir)
+            return self._cache
+    
+    def _cache_key(self, prompt: str, options: ImageOptions) -> str:
+        """
+        Build the cache key for a prompt and its generation options.
+        
+        The key is a hash of the exact request payload, so two requests
+        only share a cache entry when they'd send OpenAI the same thing.
+        """
+        payload = {**options.to_payload_template(), "prompt": prompt}
+        return hashlib.blake2b(orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)).hexdigest()
+    
+    def _get_cached_result(
+        self,
+        cache_key: str,
+        auto_save: bool,
+        save_dir: str
+    ) -> Optional[ImageResult]:
+        """
+        Look up a previous generation, making sure its image still exists.
+        
+        📚 CONCEPT: Caching
+        -------------------
+        Generating an image takes 5-30 seconds and costs money. Looking up
+        one we already made takes microseconds and is free. The saved file
+        IS the cached image - the cache only remembers where it is.
+        
+        Args:
+            cache_key: Key from ``_cache_key``
+            auto_save: Whether the caller wants the image saved in ``save_dir``
+            save_dir: Directory the caller wants the image in
+            
+        Returns:
+            The cached ImageResult, or None on a cache miss
+            
+        Raises:
+            ImageError: If copying the image into ``save_dir`` fails
+        """
+        cache = self._get_cache()
+        result = cache.get(cache_key)
+        if result is None:
+            return None
+        
+        # Someone deleted the file - treat it as a miss
+        if not result.file_path or not os.path.exists(result.file_path):
+            cache.delete(cache_key)
+            return None
+        
+        # Saved somewhere else (e.g. another story folder)? Copy it over locally
+        cached_dir = os.path.dirname(result.file_path)
+        if auto_save and os.path.abspath(cached_dir) != os.path.abspath(save_dir):
+            save_path = os.path.join(save_dir, os.path.basename(result.file_path))
+            self.downloader.copy_file(result.file_path, save_path)
+            result = dataclasses.replace(result, file_path=save_path)
+        
+        return result
+    
+    def submit_generation(
+        self,
+        prompt: str,
+        options: Optional[ImageOptions] = None,
+        save_dir: str = "generated_images"
+    ) -> ImageResult:
+        """
+        Generate an image now and download it in the background.
+        
+        📚 CONCEPT: Pipelining
+        ----------------------
+        Think of a laundromat: you don't wait for the dryer before starting
+        the next wash. Here the API call happens right away, but the
+        download runs on a background thread, so a loop over prompts can
+        start the next generation while the previous image downloads.
+        
+        EXAMPLE USAGE:
+        >>> pending = [service.submit_generation(p) for p in prompts]
+        >>> saved = [result.wait_saved() for result in pending]
+        
+        Args:
+            prompt: Text description of the desired image
+            options: Optional generation configuration
+            save_dir: Directory to save the image in (default: "generated_images")
+            
+        Returns:
+            ImageResult whose ``file_path`` is set once ``wait_saved()`` returns
+            
+        Raises:
+            ValueError: If prompt is invalid
+            ImageError: If generation fails (download errors surface from
+                        ``wait_saved()``)
+        """
+        if not self.validate_prompt(prompt):
+            raise ValueError("Invalid prompt: must be non-empty and under 4000 characters")
+        
+        if options is None:
+            options = ImageOptions()
+        
+        # Cache hit - already on disk, copied into save_dir if it lives elsewhere
+        cache_key = self._cache_key(prompt, options) if self.cache_dir else None
+        if cache_key is not None:
+            cached = self._get_cached_result(cache_key, True, save_dir)
+            if cached is not None:
+                return cached
+        
+        result = self.generate_image(prompt, options, auto_save=False, use_cache=False)
+        
+        # Base64 result - nothing to download
+        if not result.image_url:
+            return result
+        
+        safe_filename = self._generate_safe_filename(prompt, result.generation_id)
+        save_path = os.path.join(save_dir, safe_filename)
+        
+        with self._lazy_lock:
+            if self._dl_pool is None:
+                self._dl_pool = ThreadPoolExecutor(
+                    max_workers=4, thread_name_prefix="image-download"
+                )
+        
+        result._download_future = self._dl_pool.submit(
+            self._save_in_background, result, save_path, cache_key
+        )
+        return result
+    
+    def _save_in_background(
+        self,
+        result: ImageResult,
+        save_path: str,
+        cache_key: Optional[str]
+    ) -> ImageResult:
+        """Download and save an image on a worker thread, then cache it."""
+        result = self.download_and_save_image(result, save_path)
+        if cache_key is not None:
+            self._get_cache().set(cache_key, result)
+        return result
+    
+    def generate_images(
+        self,
+        prompts: List[str],
+        options: Optional[ImageOptions] = None,
+        max_workers: Optional[int] = None,
+        auto_save: bool = True,
+        save_dir: str = "generated_images"
+    ) -> List[ImageResult]:
+        """
+        Generate images for several prompts in parallel using threads.
+        
+        📚 CONCEPT: Threads for I/O-Bound Work
+        --------------------------------------
+        Python threads can't run Python code in parallel (the GIL), but they
+        CAN wait in parallel: the GIL is released while a thread waits on
+        the network. Each worker generates AND downloads its image, so
+        downloads overlap across images too.
+        
+        Use this from regular (non-async) code; ``generate_images_async``
+        is the asyncio equivalent. Every request still passes through the
+        client's rate limiter, so workers throttle themselves.
+        
+        Args:
+            prompts: Text descriptions of the desired images
+            options: Optional generation configuration shared by all prompts
+            max_workers: Number of worker threads (default: max_concurrency)
+            auto_save: Whether to download and save each image (default: True)
+            save_dir: Directory to save images in (default: "generated_images")
+            
+        Returns:
+            List of ImageResult objects, in the same order as ``prompts``
+            
+        Raises:
+            ValueError: If any prompt is invalid
+            ImageError: If any generation fails
+        """
+        # Validate everything up front so we don't pay for half a batch
+        for prompt in prompts:
+            if not self.validate_prompt(prompt):
+                raise ValueError("Invalid prompt: must be non-empty and under 4000 characters")
+        
+        self.filenames.start_batch()
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers or self.max_concurrency) as executor:
+                return list(executor.map(
+                    lambda prompt: self.generate_image(
+                        prompt, options, auto_save=auto_save, save_dir=save_dir
+                    ),
+                    prompts
+                ))
+        finally:
+            self.filenames.end_batch()
+    
+    async def generate_images_async(
+        self,
+        prompts: List[str],
+        options: Optional[ImageOptions] = None,
+        auto_save: bool = True,
+        save_dir: str = "generated_images"
+    ) -> List[ImageResult]:
+        """
+        Generate images for several prompts concurrently.
+        
+        📚 CONCEPT: Bounded Concurrency
+        -------------------------------
+        Each generation spends 5-30 seconds waiting on OpenAI. Running them
+        one after another costs ``N * latency``; running them together costs
+        about ``ceil(N / max_concurrency) * latency``.
+        
+        We don't fire ALL prompts at once, though. An ``asyncio.Semaphore``
+        works like a bouncer at the door: only ``max_concurrency`` requests
+        are inside at any moment, which keeps us friendly to rate limits.
+        
+        Like ``generate_image``, prompts we've already saved are served from
+        the cache without taking a slot or calling the API.
+        
+        EXAMPLE USAGE:
+        >>> results = asyncio.run(service.generate_images_async([
+        ...     "A space cat", "A robot chef", "A castle in the clouds"
+        ... ]))
+        
+        Args:
+            prompts: Text descriptions of the desired images
+            options: Optional generation configuration shared by all prompts
+            auto_save: Whether to download and save each image (default: True)
+            save_dir: Directory to save images in (default: "generated_images")
+            
+        Returns:
+            List of ImageResult objects, in the same order as ``prompts``
+            
+        Raises:
+            ValueError: If any prompt is invalid
+            ImageError: If any generation fails
+        """
+        # Validate everything up front so we don't pay for half a batch
+        for prompt in prompts:
+            if not self.validate_prompt(prompt):
+                raise ValueError("Invalid prompt: must be non-empty and under 4000 characters")
+        
+        if options is None:
+            options = ImageOptions()
+        
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        
+        self.filenames.start_batch()
+        try:
+            async with self.client.async_session() as session, \
+                    httpx.AsyncClient(timeout=30) as http:
+                
+                async def _generate_one(prompt: str) -> ImageResult:
+                    # Cache lookups touch the disk - keep them off the event loop
+                    cache_key = self._cache_key(prompt, options) if self.cache_dir else None
+                    if cache_key is not None:
+                        cached = await asyncio.to_thread(
+                            self._get_cached_result, cache_key, auto_save, save_dir
+                        )
+                        if cached is not None:
+                            return cached
+                    
+                    async with semaphore:
+                        raw_response = await self.client.generate_image_async(
+                            prompt, options, session
+                        )
+                        result = self.parser.parse(raw_response, prompt)
+                        
+                        if auto_save and result.image_url:
+                            safe_filename = self._generate_safe_filename(
+                                prompt, result.generation_id
+                            )
+                            save_path = os.path.join(save_dir, safe_filename)
+                            result = await self.download_and_save_image_async(
+                                result, save_path, http
+                            )
+                        
+                        if cache_key is not None and result.file_path:
+                            await asyncio.to_thread(self._get_cache().set, cache_key, result)
+                        
+                        return result
+                
+                # return_exceptions=True lets every request finish before the
+                # sessions close; we then surface the first failure
+                outcomes = await asyncio.gather(
+                    *[_generate_one(prompt) for prompt in prompts],
+                    return_exceptions=True
+                )
+        finally:
+            self.filenames.end_batch()
+        
+        for outcome in outcomes:
+            if isinstance(outcome, ImageError):
+                raise outcome
+            if isinstance(outcome, Exception):
+                raise ImageError(
+                    code="GENERATION_FAILED",
+                    message=f"Image generation failed: {str(outcome)}",
+                    details={"original_error": str(outcome)}
+                )
+        
+        return outcomes
+    
     def generate_and_save(self, prompt: str, save_path: str, options: Optional[ImageOptions] = None) -> ImageResult:
         """
         Generate an image and save it to a file.
@@ -214,19 +602,21 @@ class ImageGenerationService:
         
         return result
     
-    def download_and_save_image(self, result: ImageResult, save_path: str) -> ImageResult:
+    def download_and_save_image(
+        self,
+        result: ImageResult,
+        save_path: str,
+        keep_bytes: bool = False
+    ) -> ImageResult:
         """
         Download an image from URL and save to file.
         
-        📚 CONCEPT: Side Effects and Immutability
-        -----------------------------------------
-        This method modifies the ImageResult object (adds file_path and image_data).
-        In a more functional style, we'd return a new object. But for simplicity
-        and performance, we modify the existing one.
+        Streams to disk in chunks (see ``ImageDownloader.download``).
         
         Args:
             result: ImageResult with image_url
             save_path: Where to save the image file
+            keep_bytes: Also store the image bytes on ``result.image_data``
             
         Returns:
             Updated ImageResult with image saved to file
@@ -234,43 +624,31 @@ class ImageGenerationService:
         Raises:
             ImageError: If download or save fails
         """
-        if not result.image_url:
-            raise ImageError(
-                code="DOWNLOAD_ERROR",
-                message="No image URL available for download",
-                details={"result": str(result)}
-            )
+        return self.downloader.download(result, save_path, keep_bytes)
+    
+    async def download_and_save_image_async(
+        self,
+        result: ImageResult,
+        save_path: str,
+        http: Optional[httpx.AsyncClient] = None,
+        keep_bytes: bool = False
+    ) -> ImageResult:
+        """
+        Async sibling of ``download_and_save_image``.
         
-        try:
-            # Download image data
-            response = requests.get(result.image_url, timeout=30)
-            response.raise_for_status()
-            
-            # Update result with image data
-            result.image_data = response.content
-            
-            # Save to file
-            os.makedirs(os.path.dirname(save_path), exist_ok=True)
-            with open(save_path, 'wb') as f:
-                f.write(result.image_data)
-            
-            # Update result with file path
-            result.file_path = save_path
+        Args:
+            result: ImageResult with image_url
+            save_path: Where to save the image file
+            http: Shared httpx.AsyncClient. If None, a temporary one is used.
+            keep_bytes: Also store the image bytes on ``result.image_data``
             
-            return result
+        Returns:
+            Updated ImageResult with image saved to file
             
-        except requests.RequestException as e:
-            raise ImageError(
-                code="DOWNLOAD_ERROR",
-                message=f"Failed to download image: {str(e)}",
-                details={"url": result.image_url, "error": str(e)}
-            )
-        except OSError as e:
-            raise ImageError(
-                code="SAVE_ERROR",
-                message=f"Failed to save image: {str(e)}",
-                details={"save_path": save_path, "error": str(e)}
-            )
+        Raises:
+            ImageError: If download or save fails
+        """
+        return await self.downloader.download_async(result, save_path, http, keep_bytes)
     
     def validate_prompt(self, prompt: str) -> bool:
         """
@@ -300,21 +678,18 @@ class ImageGenerationService:
         if not prompt:
             return False
         
-        # Check if prompt is just whitespace
-        if not prompt.strip():
-            return False
-        
-        # Check length (OpenAI limit is 4000 characters)
+        # Check length (OpenAI limit is 4000 characters) - cheapest check first
         if len(prompt) > 4000:
             return False
         
-        # Basic content checks (extend as needed)
-        prompt_lower = prompt.lower()
+        # Check if prompt is just whitespace (isspace() scans in place,
+        # unlike strip() which builds a copy of the prompt)
+        if prompt.isspace():
+            return False
         
-        # Check for potentially problematic content
-        # (This is basic - real content filtering would be more sophisticated)
-        problematic_terms = ['violence', 'gore', 'explicit']
-        if any(term in prompt_lower for term in problematic_terms):
+        # Basic content checks - one case-insensitive scan, no lowercase copy
+        # (extend _BANNED_RE as needed)
+        if _BANNED_RE.search(prompt):
             return False
         
         return True
@@ -372,46 +747,9 @@ class ImageGenerationService:
             raise ValueError(f"Unknown quality level: {quality}. Use 'standard', 'high', or 'fast'")
     
     def _generate_safe_filename(self, prompt: str, generation_id: str) -> str:
-        """
-        Generate a safe filename from a prompt and generation ID.
-        
-        📚 CONCEPT: Defensive Programming
-        ---------------------------------
-        User prompts can contain characters that aren't safe for filenames:
-        - Spaces, special characters, unicode
-        - Very long prompts
-        - System-reserved names
-        
-        This method creates clean, filesystem-safe filenames.
-        
-        Args:
-            prompt: The original image prompt
-            generation_id: Unique identifier for this generation
-            
-        Returns:
-            Safe filename with .png extension
-            
-        Example:
-            prompt = "A cat wearing a space helmet!"
-            generation_id = "gen-abc123"
-            result = "a_cat_wearing_a_space_helmet_gen-abc123.png"
-        """
-        # Clean the prompt: lowercase, replace spaces and special chars with underscores
-        clean_prompt = re.sub(r'[^\w\s-]', '', prompt.lower())
-        clean_prompt = re.sub(r'[-\s]+', '_', clean_prompt)
-        
-        # Truncate if too long (keep it under 50 chars for readability)
-        if len(clean_prompt) > 50:
-            clean_prompt = clean_prompt[:50].rstrip('_')
-        
-        # Add timestamp for uniqueness
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        
-        # Combine: prompt + timestamp + generation_id
-        filename = f"{clean_prompt}_{timestamp}_{generation_id}.png"
-        
-        return filename
-
+        """Build a safe, sortable filename (see ``FilenameGenerator``)."""
+        return self.filenames.make_filename(prompt, generation_id)
+    
     def _get_next_story_folder(self, base_dir: str = "generated_images") -> str:
         """
         Get the next available story folder name.
@@ -435,7 +773,7 @@ class ImageGenerationService:
             story_folder = os.path.join(base_dir, f"story_{story_num}")
             if not os.path.exists(story_folder):
                 # Create the folder
-                os.makedirs(story_folder, exist_ok=True)
+                self.downloader.ensure_dir(story_folder)
                 print(f"📁 Created story folder: {story_folder}")
                 return story_folder
             story_num += 1
@@ -461,6 +799,7 @@ class ImageGenerationService:
         """
         start_time = datetime.now()
         
+        self.filenames.start_batch()
         try:
             # Step 1: Decompose story into scenes using GPT
             print(f"🎬 Decomposing story: {story_options.story_prompt}")
@@ -572,3 +911,5 @@ class ImageGenerationService:
                 "STORY_GENERATION_ERROR",
                 f"Failed to generate story: {str(e)}"
             )
+        finally:
+            self.filenames.end_batch()
@@ -0,0 +1,48 @@
+"""
+Test module for API key validation in the image client.
+
+This module tests that ImageGenerationClient checks key format up front:
+- Project keys (sk-proj-...) and legacy keys (sk-...) are accepted
+- Stray whitespace, short keys and junk are rejected at construction
+
+No network calls are made - validation is purely local.
+"""
+
+import pytest
+
+from src.client import ImageGenerationClient
+
+
+TEST_API_KEY = "sk-test-key-00000000000000000000000000000000"
+PROJECT_API_KEY = "sk-proj-" + "A1b2_C3d4-" * 4
+
+
+class TestApiKeyValidation:
+    """Test ImageGenerationClient's API key format check."""
+
+    def test_legacy_key_accepted(self):
+        """Test that a plain sk- key passes."""
+        client = ImageGenerationClient(TEST_API_KEY)
+
+        assert client.validate_api_key()
+
+    def test_project_key_accepted(self):
+        """Test that an sk-proj- key passes."""
+        client = ImageGenerationClient(PROJECT_API_KEY)
+
+        assert client.validate_api_key()
+
+    def test_trailing_newline_rejected(self):
+        """Test that a key copied with a newline fails fast."""
+        with pytest.raises(ValueError, match="malformed"):
+            ImageGenerationClient(TEST_API_KEY + "\n")
+
+    def test_short_key_rejected(self):
+        """Test that a truncated key fails fast."""
+        with pytest.raises(ValueError, match="malformed"):
+            ImageGenerationClient(TEST_API_KEY[:20])
+
+    def test_bad_key_raises(self):
+        """Test that junk is refused before any request is made."""
+        with pytest.raises(ValueError, match="malformed"):
+            ImageGenerationClient("sk-bad")
@@ -11,6 +11,8 @@ from src.search_service import ImageGenerationService
 from src.models import ImageOptions, ImageResult, ImageMetadata
 from datetime import datetime
 
+TEST_API_KEY = "sk-test-key-00000000000000000000000000000000"
+
 def test_auto_save_functionality():
     """Test that auto-save generates correct filenames and saves images."""
     
@@ -22,7 +24,7 @@ def test_auto_save_functionality():
         print(f"📁 Using temporary directory: {temp_dir}")
         
         # Test the filename generation
-        service = ImageGenerationService("fake-api-key")
+        service = ImageGenerationService(TEST_API_KEY, cache_dir=None)
         
         # Test filename generation
         test_cases = [
@@ -0,0 +1,409 @@
+"""
+Test module for batch image generation.
+
+This module tests generating images for several prompts at once:
+- Concurrent async generation bounded by a semaphore
+- Thread-pool generation for non-async callers
+- Pipelined generation with background downloads
+- Streaming downloads to disk (sync and async)
+- Result ordering and error propagation
+
+The tests use mocking to avoid making real API calls.
+"""
+
+import asyncio
+import io
+import os
+import shutil
+import threading
+
+import httpx
+import pytest
+import requests
+import urllib3
+from unittest.mock import MagicMock, patch
+
+from src.client import MAX_RETRY_WAIT
+from src.image_files import ImageDownloader
+from src.models import ImageError, ImageResult
+from src.search_service import ImageGenerationService
+
+
+TEST_API_KEY = "sk-test-key-00000000000000000000000000000000"
+FAKE_RESPONSE = {"created": 1698700000, "data": [{"url": "https://example.com/image.png"}]}
+
+
+class TestAsyncBatchGeneration:
+    """Test generate_images_async."""
+
+    def test_results_follow_prompt_order(self):
+        """Test that results come back in the same order as the prompts."""
+        service = ImageGenerationService(TEST_API_KEY, cache_dir=None)
+
+        async def fake_generate(prompt, options=None, session=None):
+            # Finish the first prompt last to prove ordering isn't completion order
+            await asyncio.sleep(0.02 if prompt == "First prompt" else 0)
+            return FAKE_RESPONSE
+
+        with patch.object(service.client, 'generate_image_async', side_effect=fake_generate):
+            results = asyncio.run(service.generate_images_async(
+                ["First prompt", "Second prompt", "Third prompt"],
+                auto_save=False
+            ))
+
+        assert [r.prompt for r in results] == ["First prompt", "Second prompt", "Third prompt"]
+
+    def test_concurrency_is_bounded(self):
+        """Test that no more than max_concurrency requests run at once."""
+        service = ImageGenerationService(TEST_API_KEY, max_concurrency=2, cache_dir=None)
+        in_flight = 0
+        peak = 0
+
+        async def fake_generate(prompt, options=None, session=None):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return FAKE_RESPONSE
+
+        with patch.object(service.client, 'generate_image_async', side_effect=fake_generate):
+            results = asyncio.run(service.generate_images_async(
+                [f"Prompt {i}" for i in range(6)],
+                auto_save=False
+            ))
+
+        assert len(results) == 6
+        assert peak == 2
+
+    def test_invalid_prompt_fails_before_any_request(self):
+        """Test that one bad prompt rejects the batch without calling the API."""
+        service = ImageGenerationService(TEST_API_KEY, cache_dir=None)
+
+        with patch.object(service.client, 'generate_image_async') as mock_generate:
+            with pytest.raises(ValueError):
+                asyncio.run(service.generate_images_async(["Good prompt", "   "]))
+
+        mock_generate.assert_not_called()
+
+    def test_failure_is_reported_as_image_error(self):
+        """Test that a failing prompt surfaces as an ImageError."""
+        service = ImageGenerationService(TEST_API_KEY, cache_dir=None)
+
+        async def fake_generate(prompt, options=None, session=None):
+            if prompt == "Bad prompt":
+                raise ImageError("RATE_LIMIT_ERROR", "API rate limit exceeded")
+            return FAKE_RESPONSE
+
+        with patch.object(service.client, 'generate_image_async', side_effect=fake_generate):
+            with pytest.raises(ImageError) as exc_info:
+                asyncio.run(service.generate_images_async(
+                    ["Good prompt", "Bad prompt"],
+                    auto_save=False
+                ))
+
+        assert exc_info.value.code == "RATE_LIMIT_ERROR"
+
+
+class TestThreadedBatchGeneration:
+    """Test generate_images."""
+
+    def test_results_follow_prompt_order(self):
+        """Test that results come back in the same order as the prompts."""
+        service = ImageGenerationService(TEST_API_KEY, cache_dir=None)
+
+        with patch.object(service.client, 'generate_image', return_value=FAKE_RESPONSE):
+            results = service.generate_images(
+                ["First prompt", "Second prompt", "Third prompt"],
+                auto_save=False
+            )
+
+        assert [r.prompt for r in results] == ["First prompt", "Second prompt", "Third prompt"]
+
+    def test_prompts_run_on_worker_threads(self):
+        """Test that generation happens off the calling thread."""
+        service = ImageGenerationService(TEST_API_KEY, cache_dir=None)
+        caller = threading.get_ident()
+        worker_threads = set()
+
+        def fake_generate(prompt, options=None):
+            worker_threads.add(threading.get_ident())
+            return FAKE_RESPONSE
+
+        with patch.object(service.client, 'generate_image', side_effect=fake_generate):
+            service.generate_images(["Prompt A", "Prompt B"], max_workers=2, auto_save=False)
+
+        assert caller not in worker_threads
+
+    def test_failure_is_reported_as_image_error(self):
+        """Test that a failing prompt surfaces as an ImageError."""
+        service = ImageGenerationService(TEST_API_KEY, cache_dir=None)
+
+        def fake_generate(prompt, options=None):
+            if prompt == "Bad prompt":
+                raise ImageError("API_ERROR", "API request failed")
+            return FAKE_RESPONSE
+
+        with patch.object(service.client, 'generate_image', side_effect=fake_generate):
+            with pytest.raises(ImageError) as exc_info:
+                service.generate_images(["Good prompt", "Bad prompt"], auto_save=False)
+
+        assert exc_info.value.code == "API_ERROR"
+
+
+class TestFilenameStamp:
+    """Test the timestamp part of generated filenames."""
+
+    def test_batch_files_share_one_stamp(self, tmp_path):
+        """Test that every file in a batch carries the batch's timestamp."""
+        service = ImageGenerationService(TEST_API_KEY, cache_dir=None)
+        saved_paths = []
+
+        def fake_download(result, save_path, keep_bytes=False):
+            saved_paths.append(save_path)
+            return result
+
+        with patch.object(service.client, 'generate_image', return_value=FAKE_RESPONSE), \
+             patch.object(service, 'download_and_save_image', side_effect=fake_download):
+            service.generate_images(["Prompt A", "Prompt B"], save_dir=str(tmp_path))
+
+        assert all(service.filenames._batch_stamp in path for path in saved_paths)
+        assert service.filenames._batch_depth == 0
+
+    def test_overlapping_batch_keeps_stamp(self):
+        """Test that a batch starting mid-way doesn't re-stamp the running one."""
+        service = ImageGenerationService(TEST_API_KEY, cache_dir=None)
+        service.filenames.start_batch()
+        service.filenames._batch_stamp = "20000101_000000"
+
+        service.filenames.start_batch()
+        filename = service._generate_safe_filename("A space cat", "gen-abc123")
+        service.filenames.end_batch()
+        service.filenames.end_batch()
+
+        assert "20000101_000000" in filename
+
+    def test_single_image_uses_current_time(self):
+        """Test that a call outside a batch isn't stamped with an old batch time."""
+        service = ImageGenerationService(TEST_API_KEY, cache_dir=None)
+        service.filenames._batch_stamp = "20000101_000000"
+
+        filename = service._generate_safe_filename("A space cat", "gen-abc123")
+
+        assert "20000101_000000" not in filename
+
+
+class TestSubmitGeneration:
+    """Test submit_generation and ImageResult.wait_saved."""
+
+    def test_download_happens_in_background(self, tmp_path):
+        """Test that submit returns before the image is saved."""
+        service = ImageGenerationService(TEST_API_KEY, cache_dir=None)
+        release = threading.Event()
+
+        def slow_download(result, save_path, keep_bytes=False):
+            release.wait(timeout=5)
+            result.file_path = save_path
+            return result
+
+        with patch.object(service.client, 'generate_image', return_value=FAKE_RESPONSE), \
+             patch.object(service, 'download_and_save_image', side_effect=slow_download):
+            result = service.submit_generation("A space cat", save_dir=str(tmp_path))
+            assert result.file_path is None
+
+            release.set()
+            assert result.wait_saved().file_path.startswith(str(tmp_path))
+
+        service.close()
+
+    def test_download_error_surfaces_from_wait_saved(self, tmp_path):
+        """Test that a failed background download is reported to the caller."""
+        service = ImageGenerationService(TEST_API_KEY, cache_dir=None)
+
+        with patch.object(service.client, 'generate_image', return_value=FAKE_RESPONSE), \
+             patch.object(service, 'download_and_save_image',
+                          side_effect=ImageError("DOWNLOAD_ERROR", "Failed to download image")):
+            result = service.submit_generation("A space cat", save_dir=str(tmp_path))
+
+            with pytest.raises(ImageError) as exc_info:
+                result.wait_saved()
+
+        assert exc_info.value.code == "DOWNLOAD_ERROR"
+        service.close()
+
+
+class DroppedConnection(io.BytesIO):
+    """Response body that loses the connection after the first chunk."""
+
+    def read(self, *args):
+        if self.tell():
+            raise urllib3.exceptions.ProtocolError("Connection broken")
+        return super().read(*args)
+
+
+class TestDownload:
+    """Test download_and_save_image."""
+
+    IMAGE_BYTES = b"\x89PNG" + b"x" * 200_000
+
+    def make_service(self, *bodies):
+        """Service whose download session serves ``bodies`` one per request."""
+        responses = []
+        for body in bodies:
+            response = requests.Response()
+            response.status_code = 200
+            response.raw = urllib3.HTTPResponse(body=body, preload_content=False)
+            responses.append(response)
+
+        service = ImageGenerationService(TEST_API_KEY, cache_dir=None)
+        service.downloader._http = MagicMock()
+        service.downloader._http.get.side_effect = responses
+        return service
+
+    def test_streams_image_to_disk(self, tmp_path):
+        """Test that the image is written in full without keeping the bytes."""
+        service = self.make_service(io.BytesIO(self.IMAGE_BYTES))
+        result = ImageResult(prompt="A space cat", image_url="https://example.com/image.png")
+        save_path = str(tmp_path / "images" / "cat.png")
+
+        saved = service.download_and_save_image(result, save_path)
+
+        assert saved.file_path == save_path
+        assert saved.image_data is None
+        assert os.listdir(tmp_path / "images") == ["cat.png"]
+        with open(save_path, 'rb') as f:
+            assert f.read() == self.IMAGE_BYTES
+
+    def test_keep_bytes_stores_image_data(self, tmp_path):
+        """Test that keep_bytes keeps the bytes and still saves the file."""
+        service = self.make_service(io.BytesIO(self.IMAGE_BYTES))
+        result = ImageResult(prompt="A space cat", image_url="https://example.com/image.png")
+        save_path = str(tmp_path / "cat.png")
+
+        saved = service.download_and_save_image(result, save_path, keep_bytes=True)
+
+        assert saved.image_data == self.IMAGE_BYTES
+        with open(save_path, 'rb') as f:
+            assert f.read() == self.IMAGE_BYTES
+
+    def test_dropped_connection_leaves_no_file(self, tmp_path):
+        """Test that a download cut off midway leaves nothing behind."""
+        service = self.make_service(DroppedConnection(self.IMAGE_BYTES))
+        result = ImageResult(prompt="A space cat", image_url="https://example.com/image.png")
+
+        with pytest.raises(ImageError) as exc_info:
+            service.download_and_save_image(result, str(tmp_path / "cat.png"))
+
+        assert exc_info.value.code == "DOWNLOAD_ERROR"
+        assert result.file_path is None
+        assert os.listdir(tmp_path) == []
+
+    def test_http_error_releases_connection(self, tmp_path):
+        """Test that an error response (e.g. an expired URL) is closed, not leaked."""
+        response = requests.Response()
+        response.status_code = 403
+        response.raw = urllib3.HTTPResponse(body=io.BytesIO(b"denied"), preload_content=False)
+        service = ImageGenerationService(TEST_API_KEY, cache_dir=None)
+        service.downloader._http = MagicMock()
+        service.downloader._http.get.return_value = response
+        result = ImageResult(prompt="A space cat", image_url="https://example.com/image.png")
+
+        with pytest.raises(ImageError) as exc_info:
+            service.download_and_save_image(result, str(tmp_path / "cat.png"))
+
+        assert exc_info.value.code == "DOWNLOAD_ERROR"
+        assert response.raw.closed
+
+    def test_retry_after_is_capped(self):
+        """Test that a huge Retry-After can't park a download thread for hours."""
+        downloader = ImageDownloader()
+        retries = downloader._get_http().get_adapter("https://example.com").max_retries
+        response = urllib3.HTTPResponse(headers={"Retry-After": "3600"})
+
+        assert retries.get_retry_after(response) == MAX_RETRY_WAIT
+        assert retries.increment(response=response).get_retry_after(response) == MAX_RETRY_WAIT
+        downloader.close()
+
+    def test_recreates_deleted_directory(self, tmp_path):
+        """Test that saving recovers when a known folder was deleted."""
+        service = self.make_service(io.BytesIO(self.IMAGE_BYTES), io.BytesIO(self.IMAGE_BYTES))
+        save_dir = tmp_path / "images"
+        service.download_and_save_image(
+            ImageResult(prompt="A space cat", image_url="https://example.com/1.png"),
+            str(save_dir / "first.png")
+        )
+        shutil.rmtree(save_dir)
+
+        saved = service.download_and_save_image(
+            ImageResult(prompt="A space cat", image_url="https://example.com/2.png"),
+            str(save_dir / "second.png")
+        )
+
+        assert os.path.exists(saved.file_path)
+
+
+class TestAsyncDownload:
+    """Test download_and_save_image_async."""
+
+    IMAGE_BYTES = b"\x89PNG" + b"x" * 200_000
+
+    def make_http(self, status_code=200, content=None):
+        """httpx client that serves IMAGE_BYTES without touching the network."""
+        transport = httpx.MockTransport(
+            lambda request: httpx.Response(status_code, content=content or self.IMAGE_BYTES)
+        )
+        return httpx.AsyncClient(transport=transport)
+
+    def test_streams_image_to_disk(self, tmp_path):
+        """Test that the image is written in full without keeping the bytes."""
+        service = ImageGenerationService(TEST_API_KEY, cache_dir=None)
+        result = ImageResult(prompt="A space cat", image_url="https://example.com/image.png")
+        save_path = str(tmp_path / "images" / "cat.png")
+
+        async def download():
+            async with self.make_http() as http:
+                return await service.download_and_save_image_async(result, save_path, http)
+
+        saved = asyncio.run(download())
+
+        assert saved.file_path == save_path
+        assert saved.image_data is None
+        with open(save_path, 'rb') as f:
+            assert f.read() == self.IMAGE_BYTES
+
+    def test_http_error_is_download_error(self, tmp_path):
+        """Test that a failed download surfaces as DOWNLOAD_ERROR."""
+        service = ImageGenerationService(TEST_API_KEY, cache_dir=None)
+        result = ImageResult(prompt="A space cat", image_url="https://example.com/image.png")
+
+        async def download():
+            async with self.make_http(status_code=403) as http:
+                return await service.download_and_save_image_async(
+                    result, str(tmp_path / "cat.png"), http
+                )
+
+        with pytest.raises(ImageError) as exc_info:
+            asyncio.run(download())
+
+        assert exc_info.value.code == "DOWNLOAD_ERROR"
+
+    def test_dropped_connection_leaves_no_file(self, tmp_path):
+        """Test that a download cut off midway leaves nothing behind."""
+        service = ImageGenerationService(TEST_API_KEY, cache_dir=None)
+        result = ImageResult(prompt="A space cat", image_url="https://example.com/image.png")
+
+        async def dropped_body():
+            yield self.IMAGE_BYTES[:1000]
+            raise httpx.ReadError("Connection broken")
+
+        async def download():
+            async with self.make_http(content=dropped_body()) as http:
+                return await service.download_and_save_image_async(
+                    result, str(tmp_path / "cat.png"), http
+                )
+
+        with pytest.raises(ImageError) as exc_info:
+            asyncio.run(download())
+
+        assert exc_info.value.code == "DOWNLOAD_ERROR"
+        assert os.listdir(tmp_path) == []
@@ -0,0 +1,166 @@
+"""
+Test module for the generation cache.
+
+This module tests that repeated prompts reuse saved images:
+- Cache hits skip the OpenAI API entirely
+- Missing files and different options are cache misses
+- Cached images are copied into a new save directory when needed
+- The async batch path shares the same cache
+
+The tests use mocking to avoid making real API calls.
+"""
+
+import asyncio
+import os
+
+import pytest
+from unittest.mock import patch
+
+from src.models import ImageError, ImageOptions
+from src.search_service import ImageGenerationService
+
+
+TEST_API_KEY = "sk-test-key-00000000000000000000000000000000"
+FAKE_RESPONSE = {"created": 1698700000, "data": [{"url": "https://example.com/image.png"}]}
+
+
+async def fake_generate_async(prompt, options=None, session=None):
+    """Stand-in for the client's generate_image_async."""
+    return FAKE_RESPONSE
+
+
+async def fake_download_async(result, save_path, http=None, keep_bytes=False):
+    """Async stand-in for download_and_save_image_async."""
+    return fake_download(result, save_path)
+
+
+def fake_download(result, save_path, keep_bytes=False):
+    """Stand-in for download_and_save_image that writes a tiny file."""
+    os.makedirs(os.path.dirname(save_path), exist_ok=True)
+    with open(save_path, 'wb') as f:
+        f.write(b"fake png")
+    result.file_path = save_path
+    return result
+
+
+@pytest.fixture
+def service(tmp_path):
+    """Service with a throwaway cache and mocked network calls."""
+    service = ImageGenerationService(TEST_API_KEY, cache_dir=str(tmp_path / "cache"))
+    with patch.object(service.client, 'generate_image', return_value=FAKE_RESPONSE), \
+         patch.object(service, 'download_and_save_image', side_effect=fake_download):
+        yield service
+    service.close()
+
+
+class TestImageCache:
+    """Test caching in generate_image."""
+
+    def test_repeated_prompt_skips_api(self, service, tmp_path):
+        """Test that the second identical request is served from the cache."""
+        save_dir = str(tmp_path / "images")
+
+        first = service.generate_image("A space cat", save_dir=save_dir)
+        second = service.generate_image("A space cat", save_dir=save_dir)
+
+        assert service.client.generate_image.call_count == 1
+        assert second.file_path == first.file_path
+
+    def test_different_options_are_a_miss(self, service, tmp_path):
+        """Test that changing the options generates a new image."""
+        save_dir = str(tmp_path / "images")
+
+        service.generate_image("A space cat", save_dir=save_dir)
+        service.generate_image("A space cat", ImageOptions(quality="hd"), save_dir=save_dir)
+
+        assert service.client.generate_image.call_count == 2
+
+    def test_use_cache_false_bypasses_cache(self, service, tmp_path):
+        """Test that use_cache=False always calls the API."""
+        save_dir = str(tmp_path / "images")
+
+        service.generate_image("A space cat", save_dir=save_dir)
+        service.generate_image("A space cat", save_dir=save_dir, use_cache=False)
+
+        assert service.client.generate_image.call_count == 2
+
+    def test_deleted_file_is_a_miss(self, service, tmp_path):
+        """Test that a cache entry whose file is gone is regenerated."""
+        save_dir = str(tmp_path / "images")
+
+        first = service.generate_image("A space cat", save_dir=save_dir)
+        os.remove(first.file_path)
+        service.generate_image("A space cat", save_dir=save_dir)
+
+        assert service.client.generate_image.call_count == 2
+
+    def test_hit_is_copied_into_new_save_dir(self, service, tmp_path):
+        """Test that a cached image is copied into the requested folder."""
+        first = service.generate_image("A space cat", save_dir=str(tmp_path / "story_1"))
+        second = service.generate_image("A space cat", save_dir=str(tmp_path / "story_2"))
+
+        assert service.client.generate_image.call_count == 1
+        assert os.path.dirname(second.file_path) == str(tmp_path / "story_2")
+        assert os.path.exists(first.file_path)
+        assert os.path.exists(second.file_path)
+
+    def test_cache_can_be_disabled(self, tmp_path):
+        """Test that cache_dir=None turns caching off."""
+        service = ImageGenerationService(TEST_API_KEY, cache_dir=None)
+
+        with patch.object(service.client, 'generate_image',
+                          return_value=FAKE_RESPONSE) as mock_generate:
+            service.generate_image("A space cat", auto_save=False)
+            service.generate_image("A space cat", auto_save=False)
+
+        assert mock_generate.call_count == 2
+
+    def test_failed_copy_is_save_error(self, service, tmp_path):
+        """Test that a hit that can't be copied reports SAVE_ERROR."""
+        service.generate_image("A space cat", save_dir=str(tmp_path / "images"))
+        blocker = tmp_path / "not_a_dir"
+        blocker.write_bytes(b"")
+
+        with pytest.raises(ImageError) as exc_info:
+            service.generate_image("A space cat", save_dir=str(blocker / "images"))
+
+        assert exc_info.value.code == "SAVE_ERROR"
+
+    def test_submit_generation_hit_is_copied_into_save_dir(self, service, tmp_path):
+        """Test that submit_generation honors save_dir on a cache hit."""
+        service.generate_image("A space cat", save_dir=str(tmp_path / "one"))
+
+        result = service.submit_generation("A space cat", save_dir=str(tmp_path / "two"))
+
+        assert service.client.generate_image.call_count == 1
+        assert os.path.dirname(result.wait_saved().file_path) == str(tmp_path / "two")
+
+
+class TestAsyncBatchCache:
+    """Test caching in generate_images_async."""
+
+    def test_async_batch_reads_cache(self, service, tmp_path):
+        """Test that prompts saved earlier skip the API in an async batch."""
+        save_dir = str(tmp_path / "images")
+        first = service.generate_image("A space cat", save_dir=save_dir)
+
+        with patch.object(service.client, 'generate_image_async',
+                          side_effect=fake_generate_async) as mock_generate:
+            results = asyncio.run(service.generate_images_async(["A space cat"], save_dir=save_dir))
+
+        mock_generate.assert_not_called()
+        assert results[0].file_path == first.file_path
+
+    def test_async_batch_writes_cache(self, service, tmp_path):
+        """Test that images saved by an async batch are reused later."""
+        save_dir = str(tmp_path / "images")
+
+        with patch.object(service.client, 'generate_image_async',
+                          side_effect=fake_generate_async), \
+             patch.object(service, 'download_and_save_image_async',
+                          side_effect=fake_download_async):
+            asyncio.run(service.generate_images_async(["A space cat"], save_dir=save_dir))
+
+        service.generate_image("A space cat", save_dir=save_dir)
+
+        service.client.generate_image.assert_not_called()
@@ -0,0 +1,57 @@
+"""
+Test module for reading image bytes from an ImageResult.
+
+This module tests ImageResult.read_image_data():
+- Bytes already in memory are returned as-is
+- Saved images are memory-mapped from disk
+- Missing or empty files don't raise
+
+No network calls are made - results are built by hand.
+"""
+
+import mmap
+
+from src.models import ImageResult
+
+
+IMAGE_BYTES = b"\x89PNG" + b"x" * 1000
+
+
+class TestReadImageData:
+    """Test ImageResult.read_image_data."""
+
+    def test_in_memory_bytes_returned(self, tmp_path):
+        """Test that image_data wins over the saved file."""
+        save_path = tmp_path / "cat.png"
+        save_path.write_bytes(b"something else")
+        result = ImageResult(prompt="A space cat", image_data=IMAGE_BYTES, file_path=str(save_path))
+
+        assert result.read_image_data() is IMAGE_BYTES
+
+    def test_saved_file_is_memory_mapped(self, tmp_path):
+        """Test that a saved image is mapped instead of read into memory."""
+        save_path = tmp_path / "cat.png"
+        save_path.write_bytes(IMAGE_BYTES)
+        result = ImageResult(prompt="A space cat", file_path=str(save_path))
+
+        data = result.read_image_data()
+        try:
+            assert isinstance(data, mmap.mmap)
+            assert data[:] == IMAGE_BYTES
+        finally:
+            data.close()
+
+    def test_missing_file_returns_none(self, tmp_path):
+        """Test that a deleted or never-saved image gives None."""
+        assert ImageResult(prompt="A space cat").read_image_data() is None
+        assert ImageResult(
+            prompt="A space cat", file_path=str(tmp_path / "gone.png")
+        ).read_image_data() is None
+
+    def test_empty_file_returns_empty_bytes(self, tmp_path):
+        """Test that an empty file (which mmap can't map) gives b''."""
+        save_path = tmp_path / "empty.png"
+        save_path.write_bytes(b"")
+        result = ImageResult(prompt="A space cat", file_path=str(save_path))
+
+        assert result.read_image_data() == b""
@@ -0,0 +1,311 @@
+"""
+Test module for retry and rate-limit handling in the image client.
+
+This module tests how ImageGenerationClient copes with a busy API:
+- Retrying transient failures (429, 5xx, connection errors)
+- Reusing one Idempotency-Key across the retries of a call
+- Failing fast on permanent errors (bad key, content policy)
+- Client-side throttling with a token bucket
+- Adapting the throttle to OpenAI's rate-limit headers
+
+The tests use mocking to avoid making real API calls.
+"""
+
+import asyncio
+import time
+
+import httpx
+import pytest
+from unittest.mock import MagicMock, patch
+from openai import AuthenticationError, BadRequestError, InternalServerError, RateLimitError
+from openai.types import Image, ImagesResponse
+
+from src.client import (
+    MAX_RETRY_WAIT, ImageGenerationClient, _parse_duration, _retry_after_seconds, _wait_for_retry
+)
+from src.models import ImageError
+from src.rate_limiter import TokenBucket
+
+
+TEST_API_KEY = "sk-test-key-00000000000000000000000000000000"
+API_URL = "https://api.openai.com/v1/images/generations"
+
+
+def make_api_error(error_class, status_code, headers=None, message="error"):
+    """Build an OpenAI SDK error carrying a fake HTTP response."""
+    response = httpx.Response(
+        status_code,
+        headers=headers or {},
+        request=httpx.Request("POST", API_URL)
+    )
+    return error_class(message, response=response, body=None)
+
+
+def make_image_response(headers=None):
+    """Build a fake raw SDK images response with the given HTTP headers."""
+    raw_response = MagicMock(headers=httpx.Headers(headers or {}))
+    raw_response.parse.return_value = ImagesResponse(
+        created=1698700000, data=[Image(url="https://example.com/image.png")]
+    )
+    return raw_response
+
+
+@pytest.fixture
+def client():
+    """Client whose image API is mocked out."""
+    client = ImageGenerationClient(TEST_API_KEY)
+    client._images_client = MagicMock()
+    return client
+
+
+@patch('src.client._wait_for_retry', return_value=0)
+class TestRetries:
+    """Test the retry policy for image requests."""
+
+    def test_rate_limit_is_retried(self, mock_wait, client):
+        """Test that a transient 429 does not fail the request."""
+        client._images_client.images.with_raw_response.generate.side_effect = [
+            make_api_error(RateLimitError, 429),
+            make_image_response()
+        ]
+
+        response = client.generate_image("A space cat")
+
+        assert response["data"][0]["url"] == "https://example.com/image.png"
+        assert client._images_client.images.with_raw_response.generate.call_count == 2
+
+    def test_gives_up_after_max_retries(self, mock_wait, client):
+        """Test that retries stop and the error is reported."""
+        client.max_retries = 2
+        client._images_client.images.with_raw_response.generate.side_effect = make_api_error(
+            RateLimitError, 429
+        )
+
+        with pytest.raises(ImageError) as exc_info:
+            client.generate_image("A space cat")
+
+        assert exc_info.value.code == "RATE_LIMIT_ERROR"
+        assert client._images_client.images.with_raw_response.generate.call_count == 3
+
+    def test_server_error_is_retried(self, mock_wait, client):
+        """Test that a 5xx is retried now that retries are idempotent."""
+        client._images_client.images.with_raw_response.generate.side_effect = [
+            make_api_error(InternalServerError, 500),
+            make_image_response()
+        ]
+
+        client.generate_image("A space cat")
+
+        assert client._images_client.images.with_raw_response.generate.call_count == 2
+
+    def test_retries_reuse_idempotency_key(self, mock_wait, client):
+        """Test that every attempt of one call sends the same Idempotency-Key."""
+        generate = client._images_client.images.with_raw_response.generate
+        generate.side_effect = [
+            make_api_error(RateLimitError, 429),
+            make_api_error(InternalServerError, 502),
+            make_image_response()
+        ]
+
+        client.generate_image("A space cat")
+
+        keys = {c.kwargs["extra_headers"]["Idempotency-Key"] for c in generate.call_args_list}
+        assert len(keys) == 1
+
+    def test_separate_calls_get_different_keys(self, mock_wait, client):
+        """Test that two calls with the same prompt are not merged."""
+        generate = client._images_client.images.with_raw_response.generate
+        generate.return_value = make_image_response()
+
+        client.generate_image("A space cat")
+        client.generate_image("A space cat")
+
+        keys = {c.kwargs["extra_headers"]["Idempotency-Key"] for c in generate.call_args_list}
+        assert len(keys) == 2
+
+    def test_authentication_error_is_not_retried(self, mock_wait, client):
+        """Test that a bad API key fails immediately."""
+        client._images_client.images.with_raw_response.generate.side_effect = make_api_error(
+            AuthenticationError, 401
+        )
+
+        with pytest.raises(ImageError) as exc_info:
+            client.generate_image("A space cat")
+
+        assert exc_info.value.code == "AUTHENTICATION_ERROR"
+        assert client._images_client.images.with_raw_response.generate.call_count == 1
+
+    def test_content_policy_error_is_not_retried(self, mock_wait, client):
+        """Test that a content policy rejection fails immediately."""
+        client._images_client.images.with_raw_response.generate.side_effect = make_api_error(
+            BadRequestError, 400, message="Your request was rejected by our content policy"
+        )
+
+        with pytest.raises(ImageError) as exc_info:
+            client.generate_image("A space cat")
+
+        assert exc_info.value.code == "CONTENT_POLICY_ERROR"
+        assert client._images_client.images.with_raw_response.generate.call_count == 1
+
+
+class TestRetryAfter:
+    """Test reading the Retry-After header."""
+
+    def test_reads_seconds(self):
+        """Test that a numeric Retry-After is honored."""
+        error = make_api_error(RateLimitError, 429, headers={"retry-after": "7"})
+
+        assert _retry_after_seconds(error) == 7.0
+
+    def test_missing_header_returns_none(self):
+        """Test that backoff is used when the server gives no hint."""
+        error = make_api_error(RateLimitError, 429)
+
+        assert _retry_after_seconds(error) is None
+
+    def test_http_date_returns_none(self):
+        """Test that an unparseable Retry-After falls back to backoff."""
+        error = make_api_error(
+            RateLimitError, 429, headers={"retry-after": "Wed, 21 Oct 2015 07:28:00 GMT"}
+        )
+
+        assert _retry_after_seconds(error) is None
+
+    def test_wait_is_capped(self):
+        """Test that a huge Retry-After can't stall a worker for hours."""
+        error = make_api_error(RateLimitError, 429, headers={"retry-after": "3600"})
+        retry_state = MagicMock()
+        retry_state.outcome.exception.return_value = error
+
+        assert _wait_for_retry(retry_state) == MAX_RETRY_WAIT
+
+
+class TestTokenBucket:
+    """Test the client-side token bucket."""
+
+    def test_burst_does_not_wait(self):
+        """Test that requests up to capacity go out immediately."""
+        bucket = TokenBucket(rate=1, capacity=3)
+
+        with patch('src.rate_limiter.time.sleep') as mock_sleep:
+            for _ in range(3):
+                bucket.acquire()
+
+        mock_sleep.assert_not_called()
+
+    def test_waits_when_empty(self):
+        """Test that an empty bucket makes the caller wait for a refill."""
+        bucket = TokenBucket(rate=2, capacity=1)
+        bucket.acquire()
+
+        with patch('src.rate_limiter.time.sleep') as mock_sleep:
+            bucket.acquire()
+
+        waited = mock_sleep.call_args[0][0]
+        assert 0.4 < waited <= 0.5
+
+    def test_async_acquire_refills(self):
+        """Test that the async path waits for tokens too."""
+        bucket = TokenBucket(rate=100, capacity=1)
+
+        async def acquire_twice():
+            start = time.monotonic()
+            await bucket.acquire_async()
+            await bucket.acquire_async()
+            return time.monotonic() - start
+
+        assert asyncio.run(acquire_twice()) >= 0.005
+
+    def test_limit_tokens_caps_balance(self):
+        """Test that banked tokens are trimmed to the given limit."""
+        bucket = TokenBucket(rate=1, capacity=10)
+        bucket.limit_tokens(1)
+        bucket.acquire()
+
+        with patch('src.rate_limiter.time.sleep') as mock_sleep:
+            bucket.acquire()
+
+        mock_sleep.assert_called_once()
+
+    def test_rejects_non_positive_rate(self):
+        """Test that a zero rate is refused."""
+        with pytest.raises(ValueError):
+            TokenBucket(rate=0, capacity=1)
+
+    def test_client_retries_pass_through_bucket(self):
+        """Test that every attempt, including retries, takes a token."""
+        client = ImageGenerationClient(TEST_API_KEY)
+        client._images_client = MagicMock()
+        client._images_client.images.with_raw_response.generate.side_effect = [
+            make_api_error(RateLimitError, 429),
+            make_image_response()
+        ]
+        client._bucket = MagicMock()
+
+        with patch('src.client._wait_for_retry', return_value=0):
+            client.generate_image("A space cat")
+
+        assert client._bucket.acquire.call_count == 2
+
+    def test_throttling_can_be_disabled(self):
+        """Test that requests_per_minute=None turns the bucket off."""
+        client = ImageGenerationClient(TEST_API_KEY, requests_per_minute=None)
+
+        assert client._bucket is None
+
+
+class TestAdaptiveRate:
+    """Test slowing down based on x-ratelimit-* response headers."""
+
+    def test_parse_duration(self):
+        """Test OpenAI's duration formats."""
+        assert _parse_duration("1s") == 1.0
+        assert _parse_duration("6m0s") == 360.0
+        assert _parse_duration("20ms") == pytest.approx(0.02)
+        assert _parse_duration("") is None
+
+    def test_slows_down_when_quota_runs_low(self, client):
+        """Test that few remaining requests lower the bucket rate."""
+        client._images_client.images.with_raw_response.generate.return_value = make_image_response({
+            "x-ratelimit-remaining-requests": "2",
+            "x-ratelimit-reset-requests": "20s",
+        })
+
+        client.generate_image("A space cat")
+
+        assert client._bucket.rate == pytest.approx(0.1)
+
+    def test_never_exceeds_configured_rate(self, client):
+        """Test that plenty of headroom restores the configured rate."""
+        client._bucket.rate = 0.1
+        client._images_client.images.with_raw_response.generate.return_value = make_image_response({
+            "x-ratelimit-remaining-requests": "4999",
+            "x-ratelimit-reset-requests": "12ms",
+        })
+
+        client.generate_image("A space cat")
+
+        assert client._bucket.rate == pytest.approx(50 / 60)
+
+    def test_missing_headers_leave_rate_alone(self, client):
+        """Test that responses without rate-limit headers change nothing."""
+        client._images_client.images.with_raw_response.generate.return_value = make_image_response()
+
+        client.generate_image("A space cat")
+
+        assert client._bucket.rate == pytest.approx(50 / 60)
+
+    def test_exhausted_quota_stops_the_burst(self):
+        """Test that banked tokens don't keep sending after the quota runs out."""
+        client = ImageGenerationClient(TEST_API_KEY)  # default burst of 50
+        client._images_client = MagicMock()
+        client._images_client.images.with_raw_response.generate.return_value = make_image_response({
+            "x-ratelimit-remaining-requests": "0",
+            "x-ratelimit-reset-requests": "60s",
+        })
+        client.generate_image("A space cat")
+
+        with patch('src.rate_limiter.time.sleep') as mock_sleep:
+            client.generate_image("A space cat")
+
+        assert mock_sleep.call_args[0][0] == pytest.approx(60, abs=0.1)
@@ -19,6 +19,9 @@ from src.search_service import ImageGenerationService
 from src.client import ImageGenerationClient
 
 
+TEST_API_KEY = "sk-test-key-00000000000000000000000000000000"
+
+
 class TestStoryModels:
     """Test the story-related data models."""
     
@@ -124,7 +127,7 @@ class TestStoryDecomposition:
         mock_client_instance.client.chat.completions.create.return_value = mock_response
         
         # Create client and test decomposition
-        client = ImageGenerationClient("test-key")
+        client = ImageGenerationClient(TEST_API_KEY)
         client.client = mock_client_instance.client
         
         story_options = StoryOptions(
@@ -155,7 +158,7 @@ class TestStoryDecomposition:
         
         mock_client_instance.client.chat.completions.create.return_value = mock_response
         
-        client = ImageGenerationClient("test-key")
+        client = ImageGenerationClient(TEST_API_KEY)
         client.client = mock_client_instance.client
         
         story_options = StoryOptions(story_prompt="Test story")
@@ -195,7 +198,7 @@ class TestStoryGeneration:
         mock_generate.return_value = mock_image_result
         
         # Test story generation
-        service = ImageGenerationService("test-key")
+        service = ImageGenerationService(TEST_API_KEY, cache_dir=None)
         
         story_options = StoryOptions(
             story_prompt="Test story",
@@ -231,7 +234,7 @@ class TestStoryGeneration:
         mock_success_result = Mock(spec=ImageResult)
         mock_generate.side_effect = [mock_success_result, Exception("Generation failed")]
         
-        service = ImageGenerationService("test-key")
+        service = ImageGenerationService(TEST_API_KEY, cache_dir=None)
         story_options = StoryOptions(story_prompt="Test story", num_scenes=2)
         
         result = service.generate_story(story_options)
@@ -247,7 +250,7 @@ class TestStoryGeneration:
         # Setup decomposition failure
         mock_decompose.side_effect = ImageError("DECOMPOSITION_ERROR", "Failed to decompose")
         
-        service = ImageGenerationService("test-key")
+        service = ImageGenerationService(TEST_API_KEY, cache_dir=None)
         story_options = StoryOptions(story_prompt="Test story")
         
         with pytest.raises(ImageError) as exc_info:
@@ -302,7 +305,7 @@ class TestStoryFolderOrganization:
         # Setup mock for folder checking
         mock_exists.side_effect = lambda path: "story_1" in path  # story_1 exists, story_2 doesn't
         
-        service = ImageGenerationService("test-key")
+        service = ImageGenerationService(TEST_API_KEY, cache_dir=None)
         folder_path = service._get_next_story_folder()
         
         # Should create story_2 since story_1 exists
@@ -318,7 +321,7 @@ class TestStoryFolderOrganization:
         # No story folders exist yet
         mock_exists.return_value = False
         
-        service = ImageGenerationService("test-key")
+        service = ImageGenerationService(TEST_API_KEY, cache_dir=None)
         folder_path = service._get_next_story_folder()
         
         # Should create story_1
@@ -342,7 +345,7 @@ class TestStoryFolderOrganization:
         mock_generate.return_value = mock_image_result
         
         # Test story generation
-        service = ImageGenerationService("test-key")
+        service = ImageGenerationService(TEST_API_KEY, cache_dir=None)
         story_options = StoryOptions(story_prompt="Test", auto_save=True)
         
         result = service.generate_story(story_options)
@@ -106,7 +106,7 @@ def mock_response_object(valid_api_response: Dict[str, Any]):
 @pytest.fixture
 def test_api_key() -> str:
     """Provide a test API key."""
-    return os.getenv("OPENAI_API_KEY", "sk-test-key-123")
+    return os.getenv("OPENAI_API_KEY", "sk-test-key-00000000000000000000000000000000")
 
 
 @pytest.fixture